@@ -0,0 +1,181 @@
+"""Incremental sliding-window counts for the live alerts banner.
+
+Transactions are folded into a ring of per-minute buckets as they arrive.
+Each bucket is a numpy count array with one row per second of the minute and
+one column per (processor, decline reason, high-value flag, approved) key.
+The last-3h and previous-3h windows are then sums over at most
+``2 * window`` buckets, whatever the size of the history. Only the two edge
+buckets are cut by second, which keeps the windows exact to the second.
+Nothing is stored per event, so memory depends on the window and the number
+of distinct keys, not on the transaction rate.
+"""
+import threading
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+import ingest
+
+HIGH_VALUE_CENTS = 40000
+_NS_PER_SECOND = 10 ** 9
+_KEY_COLUMNS = ["second", "processor", "decline_reason", "high_value", "approved"]
+
+
+class _Bucket:
+    __slots__ = ("minute", "counts")
+
+    def __init__(self, minute, n_keys):
+        self.minute = minute
+        self.counts = np.zeros((60, n_keys), dtype=np.int64)  # second of the minute x key
+
+    def add(self, second, code, n):
+        if code >= self.counts.shape[1]:
+            # A key first seen after this bucket was created
+            grow = max(code + 1, 2 * self.counts.shape[1]) - self.counts.shape[1]
+            self.counts = np.pad(self.counts, ((0, 0), (0, grow)))
+        self.counts[second, code] += n
+
+
+class WindowStats:
+    """Counts for one window of transactions."""
+
+    def __init__(self, counts):
+        self.total = 0
+        self.approved = 0
+        self.processors = {}    # processor -> [total, approved, Counter(reason)]
+        self.reasons = Counter()
+        self.hv_total = 0
+        self.hv_approved = 0
+        for (proc, reason, hv, approved), n in counts.items():
+            self.total += n
+            p = self.processors.setdefault(proc, [0, 0, Counter()])
+            p[0] += n
+            if approved:
+                self.approved += n
+                p[1] += n
+            else:
+                self.reasons[reason] += n
+                p[2][reason] += n
+            if hv:
+                self.hv_total += n
+                self.hv_approved += n if approved else 0
+
+    @property
+    def declined(self):
+        return self.total - self.approved
+
+    @property
+    def rate(self):
+        return self.approved / self.total * 100 if self.total else 0
+
+
+def top_reason(reasons):
+    """(reason, count) with the highest count; ties go to the first name."""
+    observed = [(r, n) for r, n in reasons.items() if n > 0 and r is not None]
+    if not observed:
+        return None, 0
+    return min(observed, key=lambda rn: (-rn[1], rn[0]))
+
+
+class SlidingWindow:
+    """Ring buffer of per-minute buckets covering the newest ``2 * window``."""
+
+    def __init__(self, window=pd.Timedelta(hours=3)):
+        self.window_s = -(-int(pd.Timedelta(window).value) // _NS_PER_SECOND)
+        self.n_buckets = -(-2 * self.window_s // 60) + 1
+        self.ring = [None] * self.n_buckets
+        self.keys = []      # key code -> (processor, decline reason, high value, approved)
+        self._codes = {}
+        self.now_ns = None
+        self.rows_seen = 0
+        self._lock = threading.Lock()
+
+    def _bucket(self, minute):
+        slot = minute % self.n_buckets
+        b = self.ring[slot]
+        if b is None or b.minute != minute:
+            b = self.ring[slot] = _Bucket(minute, max(len(self.keys), 1))
+        return b
+
+    def _code(self, key):
+        code = self._codes.get(key)
+        if code is None:
+            code = self._codes[key] = len(self.keys)
+            self.keys.append(key)
+        return code
+
+    def reset(self):
+        with self._lock:
+            self.ring = [None] * self.n_buckets
+            self.keys, self._codes = [], {}
+            self.now_ns, self.rows_seen = None, 0
+
+    def update(self, df):
+        """Fold in rows of ``df`` past the ones already seen (append-only, time-sorted frames)."""
+        if len(df) < self.rows_seen:
+            # Source was replaced rather than appended to: start over
+            self.reset()
+        new = df.iloc[self.rows_seen:]
+        if len(new):
+            # Rows older than the ring can never count: binary-search past them
+            horizon = new["timestamp"].iloc[-1] - pd.Timedelta(minutes=self.n_buckets)
+            skipped = len(new) - len(ingest.time_slice(new, start=horizon))
+            self.rows_seen += skipped
+            new = new.iloc[skipped:]
+        self.extend(new)
+
+    def extend(self, new, reset=False):
+        """Fold in a batch of newly arrived rows; ``reset`` drops everything first."""
+        if reset:
+            self.reset()
+        if new is None or new.empty:
+            return
+        with self._lock:
+            self.rows_seen += len(new)
+            ts = new["timestamp"].to_numpy().astype("datetime64[ns]").astype(np.int64)
+            batch_max = int(ts.max())
+            if self.now_ns is None or batch_max > self.now_ns:
+                self.now_ns = batch_max
+            # Rows older than the ring can never fall inside a window again
+            seconds = ts // _NS_PER_SECOND
+            oldest = (self.now_ns // _NS_PER_SECOND // 60 - self.n_buckets + 1) * 60
+            keep = seconds >= oldest
+            # One count per (second, key) in the batch instead of one entry per row
+            grouped = pd.DataFrame({
+                "second": seconds[keep],
+                "processor": new["processor"].to_numpy()[keep],
+                "decline_reason": new["decline_reason"].to_numpy()[keep],
+                "high_value": (new["amount_cents"].to_numpy() > HIGH_VALUE_CENTS)[keep],
+                "approved": new["approved"].to_numpy()[keep],
+            }).groupby(_KEY_COLUMNS, dropna=False, sort=False).size()
+            for (second, proc, reason, hv, approved), n in grouped.items():
+                key = (proc, None if pd.isna(reason) else reason, bool(hv), bool(approved))
+                minute, sub = divmod(int(second), 60)
+                self._bucket(minute).add(sub, self._code(key), n)
+
+    def _range(self, start_s, end_s):
+        """Counts for timestamps in the seconds [start_s, end_s)."""
+        totals = np.zeros(len(self.keys), dtype=np.int64)
+        first, last = start_s // 60, (end_s - 1) // 60
+        for minute in range(first, last + 1):
+            b = self.ring[minute % self.n_buckets]
+            if b is None or b.minute != minute:
+                continue
+            lo = start_s - minute * 60 if minute == first else 0
+            hi = end_s - minute * 60 if minute == last else 60
+            sums = b.counts[lo:hi].sum(axis=0)
+            totals[:len(sums)] += sums[:len(totals)]
+        return Counter({self.keys[code]: int(n) for code, n in enumerate(totals) if n})
+
+    def windows(self):
+        """(recent, previous) ``WindowStats``: [now-window, now] and the window before it."""
+        with self._lock:
+            if self.now_ns is None:
+                empty = WindowStats(Counter())
+                return empty, empty
+            now = self.now_ns // _NS_PER_SECOND
+            start = now - self.window_s
+            recent = self._range(start, now + 1)
+            previous = self._range(start - self.window_s, start)
+        return WindowStats(recent), WindowStats(previous)
@@ -0,0 +1,216 @@
+"""Shared aggregates for the insight, recommendation and alert engines.
+
+An ``AnalysisContext`` wraps one filtered view. It computes each aggregate
+the engines ask for (segment tables, the high-value slice, the regional 3DS
+table) on first use and memoizes it, so engines that run back to back on the
+same view share one set of group-bys instead of re-scanning the rows.
+A ``CubeContext`` answers the same questions from cube cells, for backends
+(SQLite) whose rows are not held in memory.
+"""
+from functools import cached_property
+
+import numpy as np
+
+import group_mode
+from row_view import RowView
+
+CARD_METHODS = ["card_visa", "card_mastercard"]
+HIGH_VALUE_CENTS = 40000
+TDS_REGIONS = {
+    "Europe (Spain + Germany)": ["Spain", "Germany"],
+    "Brazil": ["Brazil"], "Mexico": ["Mexico"],
+    "Argentina": ["Argentina"], "Colombia": ["Colombia"],
+}
+
+
+def top_val(series):
+    value = group_mode.mode(series)[0]
+    return "N/A" if value is None else value
+
+
+def segment_stats(df, by, declined=None):
+    """Totals, approval rate and top decline reason for every ``by`` segment.
+
+    Built from one groupby plus one ``group_mode`` pass over the declines per
+    grouping, so flagged segments never re-scan ``df``. ``declined`` may pass
+    in the already-filtered declined rows of ``df``.
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    stats = df.groupby(by, observed=True).agg(
+        total=("approved", "size"), approved_sum=("approved", "sum")
+    )
+    stats["rate"] = stats["approved_sum"] / stats["total"] * 100
+    stats["declined"] = stats["total"] - stats["approved_sum"]
+    dec = df[~df["approved"]] if declined is None else declined
+    # Ties resolve to the first reason alphabetically
+    modes = group_mode.group_mode(dec, by, "decline_reason").set_index(by)
+    return _with_top_reason(stats, modes)
+
+
+def cell_segment_stats(cells, by):
+    """``segment_stats`` computed from cube cells (each weighted by its count)."""
+    by = [by] if isinstance(by, str) else list(by)
+    stats = cells.groupby(by, observed=True).agg(
+        total=("count", "sum"), approved_sum=("approved_n", "sum")
+    )
+    stats["rate"] = stats["approved_sum"] / stats["total"] * 100
+    stats["declined"] = stats["total"] - stats["approved_sum"]
+    dec = cells[~cells["approved"]]
+    modes = group_mode.group_mode(dec, by, "decline_reason", weights="count").set_index(by)
+    return _with_top_reason(stats, modes)
+
+
+def _with_top_reason(stats, modes):
+    stats["top_reason"] = modes["top"].reindex(stats.index).fillna("N/A")
+    stats["top_count"] = modes["count"].reindex(stats.index).fillna(0)
+    stats["top_pct"] = np.where(stats["declined"] > 0,
+                                stats["top_count"] / stats["declined"].clip(lower=1) * 100, 0)
+    return stats.reset_index()
+
+
+class _Context:
+    """What the insight engines read from a view, whatever it is built from.
+
+    Subclasses provide ``__len__``, ``overall_rate``, ``processors``,
+    ``high_value_summary``, ``card_3ds`` and ``_segment_stats``.
+    """
+
+    def __init__(self, day_ord, split_ord=None):
+        if split_ord is None:
+            split_ord = (int(day_ord.min()) + int(day_ord.max())) // 2 if len(day_ord) else 0
+        self.split_ord = split_ord
+        self._segments = {}
+
+    def segments(self, *by):
+        """``segment_stats`` for the grouping ``by``, computed once per context."""
+        if by not in self._segments:
+            self._segments[by] = self._segment_stats(list(by))
+        return self._segments[by]
+
+    def region_3ds(self, countries):
+        """Per-half ``n``/``tds`` counts of declined card transactions in ``countries``."""
+        tds = self.card_3ds
+        region = tds[tds.index.get_level_values("country").isin(countries)]
+        return region.groupby(level="first_half").sum()
+
+
+class AnalysisContext(_Context):
+    """Lazily computed, memoized aggregates over one filtered view ``rows``.
+
+    ``rows`` is a ``RowView`` (a DataFrame is wrapped in one). Each aggregate
+    gathers only the columns it groups on. ``split_ord`` is the last day
+    (ordinal) of the earlier half of the data, which the 3DS detectors
+    compare against the later half; by default the midpoint of the view's
+    own days.
+    """
+
+    def __init__(self, rows, split_ord=None):
+        self.rows = rows if isinstance(rows, RowView) else RowView(rows)
+        super().__init__(self.rows["day_ord"], split_ord)
+
+    def __len__(self):
+        return len(self.rows)
+
+    @cached_property
+    def overall_rate(self):
+        return self.rows["approved"].mean() * 100
+
+    @cached_property
+    def declined(self):
+        return self.rows.where(~self.rows["approved"])
+
+    @cached_property
+    def processors(self):
+        """Processors in order of first appearance in the source (lowest id first)."""
+        first_id = self.rows.frame(["processor", "id"]).groupby("processor", observed=True)["id"].min()
+        return list(first_id.sort_values(kind="stable").index)
+
+    def _segment_stats(self, cols):
+        return segment_stats(self.rows.frame(cols + ["approved"]), cols,
+                             declined=self.declined.frame(cols + ["decline_reason"]))
+
+    @cached_property
+    def high_value(self):
+        return self.rows.where(self.rows["amount_cents"] > HIGH_VALUE_CENTS)
+
+    @cached_property
+    def high_value_summary(self):
+        """Approval rate and top decline reason of the >$400 slice."""
+        hv = self.high_value
+        hv_dec = hv.where(~hv["approved"])
+        reason, count, _ = group_mode.mode(hv_dec["decline_reason"])
+        return {
+            "total": len(hv),
+            "rate": hv["approved"].mean() * 100 if len(hv) else 0,
+            "declined": len(hv_dec),
+            "top_reason": "N/A" if reason is None else reason,
+            "top_pct": count / len(hv_dec) * 100 if len(hv_dec) else 0,
+        }
+
+    @cached_property
+    def card_3ds(self):
+        """Declined card transactions per (country, earlier half of the data) with 3DS counts."""
+        dec = self.declined
+        card_dec = dec.where(dec["payment_method"].isin(CARD_METHODS)).frame(
+            ["country", "day_ord", "decline_reason"])
+        return (
+            card_dec.assign(first_half=card_dec["day_ord"] <= self.split_ord,
+                            is_3ds=card_dec["decline_reason"] == "3ds_failure")
+            .groupby(["country", "first_half"], observed=True)
+            .agg(n=("is_3ds", "size"), tds=("is_3ds", "sum"))
+        )
+
+
+class CubeContext(_Context):
+    """The ``AnalysisContext`` aggregates over the cube ``cells`` of a view instead of its rows.
+
+    ``high_value`` holds the cells of the view's rows above
+    ``HIGH_VALUE_CENTS`` (the amount brackets do not split there), and
+    ``processors`` the processors in order of first appearance; both come
+    from the backend that built the cells.
+    """
+
+    def __init__(self, cells, high_value, processors, split_ord=None):
+        self.cells = cells
+        self._high_value = high_value
+        self._processors = processors
+        super().__init__(cells["day_ord"], split_ord)
+
+    def __len__(self):
+        return int(self.cells["count"].sum())
+
+    @cached_property
+    def overall_rate(self):
+        n = len(self)
+        return self.cells["approved_n"].sum() / n * 100 if n else np.nan
+
+    @property
+    def processors(self):
+        return list(self._processors)
+
+    def _segment_stats(self, cols):
+        return cell_segment_stats(self.cells, cols)
+
+    @cached_property
+    def high_value_summary(self):
+        hv = self._high_value
+        total, approved = int(hv["count"].sum()), int(hv["approved_n"].sum())
+        hv_dec = hv[~hv["approved"]]
+        reason, count, _ = group_mode.mode(hv_dec["decline_reason"], weights=hv_dec["count"])
+        return {
+            "total": total,
+            "rate": approved / total * 100 if total else 0,
+            "declined": total - approved,
+            "top_reason": "N/A" if reason is None else reason,
+            "top_pct": count / (total - approved) * 100 if total - approved else 0,
+        }
+
+    @cached_property
+    def card_3ds(self):
+        dec = self.cells[~self.cells["approved"] & self.cells["payment_method"].isin(CARD_METHODS)]
+        return (
+            dec.assign(first_half=dec["day_ord"] <= self.split_ord,
+                       tds=np.where(dec["decline_reason"] == "3ds_failure", dec["count"], 0))
+            .groupby(["country", "first_half"], observed=True)
+            .agg(n=("count", "sum"), tds=("tds", "sum"))
+        )
@@ -1,9 +1,29 @@
+import datetime
+import os
+import re
+
 import streamlit as st
 import streamlit.components.v1 as components
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-import json
+
+import alert_window
+import analysis
+import bitmap_index
+import column_cache
+import cube
+import export
+import fuzzy
+import group_mode
+import ingest
+import live_store
+import partition_store
+import query_groups
+import row_view
+import sqlite_store
+import view_cache
 
 st.set_page_config(
     page_title="Luna Travel — Payment Dashboard",
@@ -242,185 +262,265 @@ else:
             st.session_state[_key] = None
 
 
-@st.cache_data
-def load_data():
-    with open("payments.json") as f:
-        data = json.load(f)
-    df = pd.DataFrame(data)
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
-    df["date"] = df["timestamp"].dt.date
-    df["day"] = df["timestamp"].dt.day
-    df["hour"] = df["timestamp"].dt.hour
-    df["approved_int"] = df["approved"].astype(int)
-    df["amount_bin"] = pd.cut(
-        df["amount"],
-        bins=[0, 50, 200, 500, float("inf")],
-        labels=["$0–50", "$50–200", "$200–500", "$500+"]
-    )
+DATA_PATH = "payments.json"
+# Point at an append-only NDJSON transaction log to tail it instead of DATA_PATH
+LIVE_LOG_PATH = os.environ.get("PAYMENTS_LOG") or None
+# Optional SQLite (WAL) database to serve from; filled from DATA_PATH when empty
+DB_PATH = None if LIVE_LOG_PATH else os.environ.get("PAYMENTS_DB") or None
+# Optional date-partitioned directory (generate_payments.py --partitioned); read per day range
+PARTS_PATH = None if LIVE_LOG_PATH or DB_PATH else os.environ.get("PAYMENTS_PARTS") or None
+# Bump whenever the ingest layout (columns or row order) changes so old snapshots are rebuilt
+SNAPSHOT_SCHEMA = "v3"
+
+
+@st.cache_resource
+def load_data(path=DATA_PATH):
+    """The dataset, shared by every session and rerun: treat it as read-only."""
+    df = column_cache.load_snapshot(path, schema=SNAPSHOT_SCHEMA)
+    if df is not None:
+        return df
+    fingerprint = column_cache.source_fingerprint(path)
+    df = ingest.read_payments(path)
+    column_cache.save_snapshot(df, path, schema=SNAPSHOT_SCHEMA, fingerprint=fingerprint)
     return df
 
 
-def top_val(series):
-    vc = series.value_counts()
-    return vc.idxmax() if len(vc) > 0 else "N/A"
+@st.cache_resource
+def load_cube(path=DATA_PATH):
+    return cube.build_cube(load_data(path))
+
+
+@st.cache_resource
+def load_live_store(path):
+    """Tail-following store for the log at ``path``, shared by every session."""
+    return live_store.LiveStore(path)
+
+
+@st.cache_resource
+def load_db(path):
+    """SQLite backend at ``path``, shared by every session."""
+    db = sqlite_store.PaymentsDB(path)
+    if not db.row_count():
+        db.import_file(DATA_PATH)
+    return db
+
+
+@st.cache_data(max_entries=2)
+def load_db_row_count(version, _db):
+    return _db.row_count()
+
+
+@st.cache_data(max_entries=32)
+def load_db_cells(version, _db, days=None, reasons=None, amount=None, **members):
+    # Aggregated in SQL under the given filters; only the cells come back
+    return _db.cube_cells(days, reasons, amount, **members)
+
+
+@st.cache_data(max_entries=2)
+def load_db_value_stats(version, _db):
+    # Per-value counts only: a coarse GROUP BY, not the full cube
+    return cube.value_stats(_db.cube_cells(dims=["country", "processor", "payment_method", "decline_reason"]))
+
+
+@st.cache_data(max_entries=2)
+def load_db_recent(version, _db):
+    # Both 3h alert windows
+    return _db.recent_rows(pd.Timedelta(hours=6))
+
+
+@st.cache_resource
+def load_parts(path):
+    """Partitioned dataset at ``path``; only its manifest is read up front."""
+    return partition_store.PartitionStore(path)
+
+
+@st.cache_resource(max_entries=4)
+def load_parts_range(version, days, _parts):
+    return _parts.load(days)
+
+
+@st.cache_resource(max_entries=4)
+def load_parts_cells(version, days, _parts):
+    return cube.build_cube(load_parts_range(version, days, _parts))
+
+
+@st.cache_data(max_entries=2)
+def load_parts_recent(version, _parts):
+    # Both 3h alert windows
+    return _parts.load_recent(pd.Timedelta(hours=6))
+
+
+@st.cache_resource(max_entries=2)
+def load_bitmap_index(version, _df):
+    return bitmap_index.BitmapIndex(_df)
+
+
+@st.cache_data(max_entries=2)
+def load_value_stats(version, _cells):
+    # Rolled up from the cube, which live data already extends incrementally
+    return cube.value_stats(_cells)
+
+
+@st.cache_data
+def dataset_version(path=DATA_PATH):
+    """Identifies the loaded dataset; cached alongside ``load_data`` so both reset together."""
+    fp = column_cache.source_fingerprint(path, with_hash=False)
+    return f"{SNAPSHOT_SCHEMA}:{fp['size']}:{fp['mtime_ns']}"
+
+
+@st.cache_resource(max_entries=2)
+def load_alert_window(stream):
+    """Per-minute alert buckets for one data stream, shared by every session.
+
+    Outside live mode the stream is the data version, so older versions' windows are let go.
+    """
+    window = alert_window.SlidingWindow(window=pd.Timedelta(hours=3))
+    if LIVE_LOG_PATH:
+        load_live_store(LIVE_LOG_PATH).subscribe(window.extend)
+    return window
+
+
+@st.cache_resource
+def load_view_cache():
+    """Process-wide view cache (LRU + TTL), shared by every session."""
+    return view_cache.ViewCache(max_entries=32, ttl=900, max_bytes=64 * 2**20)
+
+
+@st.cache_resource
+def load_export_cache():
+    """Process-wide cache of serialized exports, keyed by view signature and format."""
+    return view_cache.ViewCache(max_entries=8, ttl=900, max_bytes=64 * 2**20)
+
+
+@st.cache_resource
+def load_query_cache():
+    """Process-wide cache of search-bar query plans and their results."""
+    return view_cache.ViewCache(max_entries=64, ttl=900, max_bytes=32 * 2**20)
 
 
-def generate_insights(df):
+def export_data(signature, rows, fmt):
+    """Download payload for one view: serialized only on click, then reused per format."""
+    cache = load_export_cache()
+    return lambda: cache.get_or_build((signature, fmt), lambda: export.export_bytes(rows, fmt))
+
+
+def generate_insights(ctx):
     insights = []
-    if df.empty or len(df) < 20:
+    if len(ctx) < 20:
         return insights
-    overall_rate = df["approved_int"].mean() * 100
+    overall_rate = ctx.overall_rate
 
     # 1. Processor outage: any processor × day with <30% approval (min 15 txns)
-    proc_daily = df.groupby(["processor", "date"]).agg(
-        total=("id", "count"), approved_sum=("approved_int", "sum")
-    ).reset_index()
-    proc_daily["rate"] = proc_daily["approved_sum"] / proc_daily["total"] * 100
-    for _, row in proc_daily.iterrows():
-        if row["total"] < 15 or row["rate"] >= 30:
-            continue
-        sub_dec = df[(df["processor"] == row["processor"]) &
-                     (df["date"] == row["date"]) & ~df["approved"]]
-        if sub_dec.empty:
-            continue
-        top_reason = top_val(sub_dec["decline_reason"])
-        top_pct = sub_dec["decline_reason"].value_counts().iloc[0] / len(sub_dec) * 100
+    proc_daily = ctx.segments("processor", "day_ord")
+    flagged = proc_daily[(proc_daily["total"] >= 15) & (proc_daily["rate"] < 30) &
+                         (proc_daily["declined"] > 0)]
+    for row in flagged.to_dict("records"):
+        date = ingest.ordinal_to_date(row["day_ord"])
         insights.append({
             "level": "error",
-            "title": f"{row['processor']} outage on {row['date']}",
+            "title": f"{row['processor']} outage on {date}",
             "text": (
-                f"**{row['processor']}** had only **{row['rate']:.1f}%** approval on **{row['date']}** "
+                f"**{row['processor']}** had only **{row['rate']:.1f}%** approval on **{date}** "
                 f"({int(row['total'])} transactions). "
-                f"**{top_reason}** made up {top_pct:.0f}% of declines — likely a technical incident."
+                f"**{row['top_reason']}** made up {row['top_pct']:.0f}% of declines — likely a technical incident."
             )
         })
 
     # 2. Daily approval rate drops (>15pp below overall, min 20 txns)
-    daily_agg = df.groupby("date").agg(
-        total=("id", "count"), approved_sum=("approved_int", "sum")
-    ).reset_index()
-    daily_agg["rate"] = daily_agg["approved_sum"] / daily_agg["total"] * 100
-    for _, row in daily_agg.iterrows():
-        drop = overall_rate - row["rate"]
-        if row["total"] < 20 or drop <= 15:
-            continue
-        day_df = df[df["date"] == row["date"]]
-        proc_rates = day_df.groupby("processor").agg(
-            total=("id", "count"), approved=("approved_int", "sum"))
-        proc_rates["rate"] = proc_rates["approved"] / proc_rates["total"] * 100
-        worst_proc = proc_rates["rate"].idxmin()
-        worst_rate = proc_rates.loc[worst_proc, "rate"]
-        day_dec = day_df[~day_df["approved"]]
-        top_reason = top_val(day_dec["decline_reason"])
-        top_pct = day_dec["decline_reason"].value_counts().iloc[0] / len(day_dec) * 100 if not day_dec.empty else 0
-        already = any(str(row["date"]) in i["title"] and "outage" in i["title"] for i in insights)
+    daily_agg = ctx.segments("day_ord").copy()
+    daily_agg["drop"] = overall_rate - daily_agg["rate"]
+    flagged = daily_agg[(daily_agg["total"] >= 20) & (daily_agg["drop"] > 15)]
+    if not flagged.empty:
+        # Worst processor per flagged day: first minimum in processor order
+        day_proc = ctx.segments("day_ord", "processor")
+        day_proc = day_proc[day_proc["day_ord"].isin(flagged["day_ord"])]
+        worst = (day_proc.sort_values(["day_ord", "rate"], kind="stable")
+                 .drop_duplicates("day_ord").set_index("day_ord"))
+    for row in flagged.to_dict("records"):
+        date = ingest.ordinal_to_date(row["day_ord"])
+        worst_proc = worst.at[row["day_ord"], "processor"]
+        worst_rate = worst.at[row["day_ord"], "rate"]
+        already = any(str(date) in i["title"] and "outage" in i["title"] for i in insights)
         if not already:
             insights.append({
                 "level": "error",
-                "title": f"Approval rate drop on {row['date']}",
+                "title": f"Approval rate drop on {date}",
                 "text": (
-                    f"Approval fell to **{row['rate']:.1f}%** on **{row['date']}** "
-                    f"({drop:.0f}pp below average of {overall_rate:.1f}%). "
+                    f"Approval fell to **{row['rate']:.1f}%** on **{date}** "
+                    f"({row['drop']:.0f}pp below average of {overall_rate:.1f}%). "
                     f"{worst_proc} was worst at {worst_rate:.1f}%. "
-                    f"Top decline: **{top_reason}** ({top_pct:.0f}% of that day's declines)."
+                    f"Top decline: **{row['top_reason']}** ({row['top_pct']:.0f}% of that day's declines)."
                 )
             })
 
     # 3. Country × Method underperformance (>15pp below overall, min 10 txns)
-    cm = df.groupby(["country", "payment_method"]).agg(
-        total=("id", "count"), approved_sum=("approved_int", "sum")
-    ).reset_index()
-    cm["rate"] = cm["approved_sum"] / cm["total"] * 100
-    for _, row in cm.iterrows():
-        if row["total"] < 10 or (overall_rate - row["rate"]) <= 15:
-            continue
-        sub_dec = df[(df["country"] == row["country"]) &
-                     (df["payment_method"] == row["payment_method"]) & ~df["approved"]]
-        if sub_dec.empty:
-            continue
-        top_reason = top_val(sub_dec["decline_reason"])
-        top_pct = sub_dec["decline_reason"].value_counts().iloc[0] / len(sub_dec) * 100
+    cm = ctx.segments("country", "payment_method")
+    flagged = cm[(cm["total"] >= 10) & (overall_rate - cm["rate"] > 15) & (cm["declined"] > 0)]
+    for row in flagged.to_dict("records"):
         insights.append({
             "level": "warning",
             "title": f"{row['payment_method']} in {row['country']} underperforming",
             "text": (
                 f"**{row['payment_method']}** in **{row['country']}** has only **{row['rate']:.1f}%** approval "
                 f"({overall_rate - row['rate']:.0f}pp below average). "
-                f"Top decline: **{top_reason}** ({top_pct:.0f}% of declines, {int(row['total'])} txns)."
+                f"Top decline: **{row['top_reason']}** ({row['top_pct']:.0f}% of declines, {int(row['total'])} txns)."
             )
         })
 
     # 4. High-value transaction gap (>$400, >10pp gap)
-    high_val = df[df["amount"] > 400]
-    if len(high_val) >= 10:
-        high_rate = high_val["approved_int"].mean() * 100
+    hv = ctx.high_value_summary
+    if hv["total"] >= 10:
+        high_rate = hv["rate"]
         gap = overall_rate - high_rate
         if gap > 10:
-            hv_dec = high_val[~high_val["approved"]]
-            top_reason = top_val(hv_dec["decline_reason"])
-            top_pct = hv_dec["decline_reason"].value_counts().iloc[0] / len(hv_dec) * 100 if not hv_dec.empty else 0
             insights.append({
                 "level": "warning",
                 "title": "High-value transactions (>$400) underperforming",
                 "text": (
                     f"Transactions above $400 have **{high_rate:.1f}%** approval — "
                     f"**{gap:.0f}pp lower** than overall ({overall_rate:.1f}%). "
-                    f"Primary driver: **{top_reason}** ({top_pct:.0f}% of high-value declines, {len(high_val)} txns)."
+                    f"Primary driver: **{hv['top_reason']}** ({hv['top_pct']:.0f}% of high-value declines, {hv['total']} txns)."
                 )
             })
 
     # 5. 3DS spike detection (>35% of card declines in any region)
-    card_methods = ["card_visa", "card_mastercard"]
-    for label, countries_list in {
-        "Europe (Spain + Germany)": ["Spain", "Germany"],
-        "Brazil": ["Brazil"], "Mexico": ["Mexico"],
-        "Argentina": ["Argentina"], "Colombia": ["Colombia"],
-    }.items():
-        sub = df[df["country"].isin(countries_list) &
-                 df["payment_method"].isin(card_methods) & ~df["approved"]]
-        if len(sub) < 10:
+    for label, countries_list in analysis.TDS_REGIONS.items():
+        halves = ctx.region_3ds(countries_list)
+        n_sub = int(halves["n"].sum())
+        if n_sub < 10:
             continue
-        tds_rate = (sub["decline_reason"] == "3ds_failure").mean() * 100
+        tds_rate = halves["tds"].sum() / n_sub * 100
         if tds_rate <= 35:
             continue
         timing = ""
-        h1 = sub[sub["day"] <= 15]
-        h2 = sub[sub["day"] > 15]
-        if len(h1) >= 5 and len(h2) >= 5:
-            r1 = (h1["decline_reason"] == "3ds_failure").mean() * 100
-            r2 = (h2["decline_reason"] == "3ds_failure").mean() * 100
+        h1 = halves.loc[True] if True in halves.index else None
+        h2 = halves.loc[False] if False in halves.index else None
+        if h1 is not None and h2 is not None and h1["n"] >= 5 and h2["n"] >= 5:
+            r1 = h1["tds"] / h1["n"] * 100
+            r2 = h2["tds"] / h2["n"] * 100
             if r2 - r1 > 15:
-                timing = " Spike started in the **second half of the month** (Nov 16+)."
+                second = ingest.ordinal_to_date(ctx.split_ord + 1)
+                timing = f" Spike started in the **second half of the {span_unit}** ({second:%b} {second.day}+)."
         insights.append({
             "level": "warning",
             "title": f"3DS failure spike in {label}",
             "text": (
                 f"**{tds_rate:.0f}%** of card declines in **{label}** are **3DS failures** "
-                f"({len(sub)} declined card txns).{timing} Investigate 3DS config for this region."
+                f"({n_sub} declined card txns).{timing} Investigate 3DS config for this region."
             )
         })
 
     # 6. Processor × Country underperformance (>20pp below overall, min 10 txns)
-    pc = df.groupby(["processor", "country"]).agg(
-        total=("id", "count"), approved_sum=("approved_int", "sum")
-    ).reset_index()
-    pc["rate"] = pc["approved_sum"] / pc["total"] * 100
-    for _, row in pc.iterrows():
-        if row["total"] < 10 or (overall_rate - row["rate"]) <= 20:
-            continue
-        sub_dec = df[(df["processor"] == row["processor"]) &
-                     (df["country"] == row["country"]) & ~df["approved"]]
-        if sub_dec.empty:
-            continue
-        top_reason = top_val(sub_dec["decline_reason"])
-        top_pct = sub_dec["decline_reason"].value_counts().iloc[0] / len(sub_dec) * 100
+    pc = ctx.segments("processor", "country")
+    flagged = pc[(pc["total"] >= 10) & (overall_rate - pc["rate"] > 20) & (pc["declined"] > 0)]
+    for row in flagged.to_dict("records"):
         insights.append({
             "level": "warning",
             "title": f"{row['processor']} underperforming in {row['country']}",
             "text": (
                 f"**{row['processor']}** in **{row['country']}**: **{row['rate']:.1f}%** approval "
                 f"({overall_rate - row['rate']:.0f}pp below average). "
-                f"Top decline: **{top_reason}** ({top_pct:.0f}%, {int(row['total'])} txns)."
+                f"Top decline: **{row['top_reason']}** ({row['top_pct']:.0f}%, {int(row['total'])} txns)."
             )
         })
 
@@ -433,45 +533,34 @@ def generate_insights(df):
     return unique
 
 
-def generate_recommendations(df):
+def generate_recommendations(ctx):
     """Produce specific, actionable recommendations based on data patterns."""
     recs = []
-    if df.empty or len(df) < 20:
+    if len(ctx) < 20:
         return recs
 
-    overall_rate = df["approved_int"].mean() * 100
+    overall_rate = ctx.overall_rate
 
     # 1. Processor outage → escalate + failover
-    proc_daily = df.groupby(["processor", "date"]).agg(
-        total=("id", "count"), approved_sum=("approved_int", "sum")
-    ).reset_index()
-    proc_daily["rate"] = proc_daily["approved_sum"] / proc_daily["total"] * 100
-    for _, row in proc_daily.iterrows():
-        if row["total"] < 15 or row["rate"] >= 30:
-            continue
-        other_procs = [p for p in df["processor"].unique() if p != row["processor"]]
+    proc_daily = ctx.segments("processor", "day_ord")
+    for row in proc_daily[(proc_daily["total"] >= 15) & (proc_daily["rate"] < 30)].to_dict("records"):
+        date = ingest.ordinal_to_date(row["day_ord"])
+        other_procs = [p for p in ctx.processors if p != row["processor"]]
         recs.append({
             "priority": "high",
-            "action": f"Escalate {row['processor']} outage on {row['date']}",
+            "action": f"Escalate {row['processor']} outage on {date}",
             "detail": (
-                f"{row['processor']} dropped to {row['rate']:.0f}% approval on {row['date']}. "
+                f"{row['processor']} dropped to {row['rate']:.0f}% approval on {date}. "
                 f"Open a P1 ticket with {row['processor']} immediately. "
                 f"Enable automatic failover to {' or '.join(other_procs)} for affected segments until resolved."
             )
         })
 
     # 2. Processor × Country underperformance → re-route
-    pc = df.groupby(["processor", "country"]).agg(
-        total=("id", "count"), approved_sum=("approved_int", "sum")
-    ).reset_index()
-    pc["rate"] = pc["approved_sum"] / pc["total"] * 100
-    for _, row in pc.iterrows():
-        if row["total"] < 15:
-            continue
+    pc = ctx.segments("processor", "country")
+    for row in pc[(pc["total"] >= 15) & (overall_rate - pc["rate"] > 20)].to_dict("records"):
         drop = overall_rate - row["rate"]
-        if drop <= 20:
-            continue
-        other_procs = [p for p in df["processor"].unique() if p != row["processor"]]
+        other_procs = [p for p in ctx.processors if p != row["processor"]]
         recs.append({
             "priority": "medium",
             "action": f"Re-route {row['country']} payments away from {row['processor']}",
@@ -483,17 +572,12 @@ def generate_recommendations(df):
         })
 
     # 3. 3DS spike → investigate configuration
-    card_methods = ["card_visa", "card_mastercard"]
-    for label, countries_list in {
-        "Europe (Spain + Germany)": ["Spain", "Germany"],
-        "Brazil": ["Brazil"], "Mexico": ["Mexico"],
-        "Argentina": ["Argentina"], "Colombia": ["Colombia"],
-    }.items():
-        sub = df[df["country"].isin(countries_list) &
-                 df["payment_method"].isin(card_methods) & ~df["approved"]]
-        if len(sub) < 10:
+    for label, countries_list in analysis.TDS_REGIONS.items():
+        halves = ctx.region_3ds(countries_list)
+        n_sub = int(halves["n"].sum())
+        if n_sub < 10:
             continue
-        tds_rate = (sub["decline_reason"] == "3ds_failure").mean() * 100
+        tds_rate = halves["tds"].sum() / n_sub * 100
         if tds_rate <= 35:
             continue
         recs.append({
@@ -507,13 +591,12 @@ def generate_recommendations(df):
         })
 
     # 4. High-value transactions underperforming → fraud rules or routing
-    high_val = df[df["amount"] > 400]
-    if len(high_val) >= 10:
-        high_rate = high_val["approved_int"].mean() * 100
+    hv = ctx.high_value_summary
+    if hv["total"] >= 10:
+        high_rate = hv["rate"]
         gap = overall_rate - high_rate
         if gap > 10:
-            hv_dec = high_val[~high_val["approved"]]
-            top_reason = top_val(hv_dec["decline_reason"]) if not hv_dec.empty else "unknown"
+            top_reason = hv["top_reason"] if hv["declined"] else "unknown"
             if "fraud" in top_reason.lower():
                 recs.append({
                     "priority": "medium",
@@ -535,23 +618,12 @@ def generate_recommendations(df):
                 })
 
     # 5. Country × Method underperformance → alternative methods or failover
-    cm = df.groupby(["country", "payment_method"]).agg(
-        total=("id", "count"), approved_sum=("approved_int", "sum")
-    ).reset_index()
-    cm["rate"] = cm["approved_sum"] / cm["total"] * 100
+    cm = ctx.segments("country", "payment_method")
     alt_methods = {"Brazil": "PIX", "Mexico": "OXXO", "Colombia": "card_visa",
                    "Argentina": "card_mastercard", "Spain": "SEPA", "Germany": "SEPA"}
-    for _, row in cm.iterrows():
-        if row["total"] < 10:
-            continue
-        drop = overall_rate - row["rate"]
-        if drop <= 15:
-            continue
-        sub_dec = df[(df["country"] == row["country"]) &
-                     (df["payment_method"] == row["payment_method"]) & ~df["approved"]]
-        if sub_dec.empty:
-            continue
-        top_reason = top_val(sub_dec["decline_reason"])
+    flagged = cm[(cm["total"] >= 10) & (overall_rate - cm["rate"] > 15) & (cm["declined"] > 0)]
+    for row in flagged.to_dict("records"):
+        top_reason = row["top_reason"]
         alt = alt_methods.get(row["country"], "an alternative local method")
         if top_reason == "technical_error":
             recs.append({
@@ -586,7 +658,73 @@ def generate_recommendations(df):
 
 
 # ── Load data ─────────────────────────────────────────────────────────────────
-df = load_data()
+if LIVE_LOG_PATH:
+    # Parse only what was appended to the log since the last run
+    store = load_live_store(LIVE_LOG_PATH)
+    store.poll()
+    df, cells, index, data_version = store.snapshot()
+    if df is None:
+        st.info(f"Waiting for transactions in {LIVE_LOG_PATH}…")
+        st.stop()
+    row_total, data_source = len(df), "Live log"
+elif DB_PATH:
+    db = load_db(DB_PATH)
+    # Rows and cells are queried below, under the sidebar filters, in SQL instead of on bitmaps
+    df = cells = index = None
+    data_version = db.version
+    row_total, data_source = load_db_row_count(data_version, db), "SQLite"
+elif PARTS_PATH:
+    # Rows are read below the day slider, from the partitions it selects
+    parts = load_parts(PARTS_PATH)
+    df = cells = index = None
+    data_version = parts.version
+    row_total, data_source = parts.row_count(), "Partitioned"
+else:
+    df = load_data()
+    cells = load_cube()
+    data_version = dataset_version()
+    index = load_bitmap_index(data_version, df)
+    row_total, data_source = len(df), "Mock data"
+# Identifies the rows in ``df``; partitioned data narrows it to the selected days below
+rows_version = data_version
+
+# ── Date span ─────────────────────────────────────────────────────────────────
+# First and last day held (rows are time-sorted); every date slider ranges over it
+if PARTS_PATH:
+    data_span = parts.span
+elif DB_PATH:
+    data_span = db.span
+else:
+    data_span = (ingest.ordinal_to_date(df["day_ord"].iloc[0]),
+                 ingest.ordinal_to_date(df["day_ord"].iloc[-1]))
+# Last day of the earlier half: the 3DS detectors and cohort defaults compare the halves
+split_ord = (data_span[0].toordinal() + data_span[1].toordinal()) // 2
+span_unit = "month" if data_span[0].replace(day=1) == data_span[1].replace(day=1) else "period"
+
+
+def _fmt_span(first, last, sep="–"):
+    """``Nov 10–25``, ``Nov 28–Dec 3`` or ``Dec 28, 2023–Jan 3, 2024``."""
+    if first.year != last.year:
+        return f"{first:%b} {first.day}, {first.year}{sep}{last:%b} {last.day}, {last.year}"
+    if first.month != last.month:
+        return f"{first:%b} {first.day}{sep}{last:%b} {last.day}"
+    return f"{first:%b} {first.day}{sep}{last.day}"
+
+
+span_label = f"{data_span[0]:%B %Y}" if span_unit == "month" else _fmt_span(*data_span)
+
+
+def _ords(date_range):
+    """Inclusive ``day_ord`` span of a (first, last) date range."""
+    return (date_range[0].toordinal(), date_range[1].toordinal())
+
+
+def _date_slider(label, value, **kwargs):
+    """Range slider over ``data_span``; a single-day span has nothing to slide."""
+    if data_span[0] == data_span[1]:
+        return data_span
+    return st.slider(label, min_value=data_span[0], max_value=data_span[1],
+                     value=value, format="MMM D, YYYY", **kwargs)
 
 # ── Global Plotly layout defaults (Yuno brand) ────────────────────────────────
 import plotly.io as pio
@@ -612,18 +750,49 @@ def _plot(fig, **kwargs):
 
 
 # ── Natural-language query parser ─────────────────────────────────────────────
-def parse_query(query, df):
-    """Extract filters + intent from free-text / question. Returns dict."""
-    import re, difflib
+_MONTHS = {m: i for i, m in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], 1)}
+_MONTH_NAMES = ("january|february|march|april|may|june|july|august|september|"
+                "october|november|december|jan|feb|mar|apr|jun|jul|aug|sept|sep|oct|nov|dec")
+
+
+_GROUP_LABELS = {"decline_reason": "decline reason", "payment_method": "payment method",
+                 "country": "country", "processor": "processor", "hour": "hour",
+                 "day_ord": "day", "amount_bin": "amount bracket"}
+# Intent of the question -> column of the grouped table
+_GROUP_METRICS = {"count_declined": "declined", "count_approved": "approved_sum", "count": "total",
+                  "rate": "approval_rate", "best_processor": "approval_rate", "top_decline": "top_reason",
+                  "avg_amount": "avg_amount", "volume": "volume"}
+_METRIC_LABELS = {"total": "Transactions", "approved_sum": "Approved", "declined": "Declined",
+                  "approval_rate": "Approval rate (%)", "volume": "Volume ($)",
+                  "avg_amount": "Avg amount ($)", "top_reason": "Top decline reason"}
+
 
+def _month_days(month_start, d1, d2):
+    """(first, last) dates for days ``d1``..``d2`` of a month, clamped to its length."""
+    month_end = (month_start + datetime.timedelta(days=32)).replace(day=1) - datetime.timedelta(days=1)
+    return (month_start.replace(day=max(1, min(d1, month_end.day))),
+            month_start.replace(day=max(1, min(d2, month_end.day))))
+
+
+def plan_query(query, stats, last_day):
+    """Compile free text / a question into a query plan: normalized filters + intent.
+
+    ``stats`` (``cube.value_stats``) supplies the known dimension values and
+    ``last_day`` anchors relative dates, so no rows are read here.
+    """
     q = query.lower().strip()
 
+    # ── Grouping ──────────────────────────────────────────────────────────────
+    # "by country" groups; "by processor b" names a value and stays a filter
+    group_by, q = query_groups.split_group_by(q, stats)
+
     # ── Dimension extraction ──────────────────────────────────────────────────
     country_aliases = {"brasil": "Brazil", "br": "Brazil", "mex": "Mexico",
                        "arg": "Argentina", "col": "Colombia", "esp": "Spain",
                        "ger": "Germany", "deutschland": "Germany"}
     found_countries = []
-    for c in df["country"].unique():
+    for c in stats["country"]:
         if c.lower() in q or any(w == c.lower() for w in q.split()):
             found_countries.append(c)
     for alias, real in country_aliases.items():
@@ -631,10 +800,12 @@ def parse_query(query, df):
             found_countries.append(real)
 
     found_processors = []
-    for p in df["processor"].unique():
+    processors = list(stats["processor"])
+    proc_scores = fuzzy.matcher(tuple(p.lower() for p in processors)).scores(q, 0.72, query_first=False)
+    for p, score in zip(processors, proc_scores):
         if p.lower() in q or p.lower().replace(" ", "") in q.replace(" ", ""):
             found_processors.append(p)
-        elif difflib.SequenceMatcher(None, p.lower(), q).ratio() > 0.72:
+        elif score > 0.72:
             found_processors.append(p)
 
     method_aliases = {
@@ -647,7 +818,7 @@ def parse_query(query, df):
     for alias, actuals in method_aliases.items():
         if alias in q:
             found_methods.extend(actuals)
-    for m in df["payment_method"].unique():
+    for m in stats["payment_method"]:
         if m.lower() in q and m not in found_methods:
             found_methods.append(m)
     found_methods = list(dict.fromkeys(found_methods))
@@ -664,31 +835,37 @@ def parse_query(query, df):
     for alias, actual in reason_aliases.items():
         if alias in q and actual not in found_reasons:
             found_reasons.append(actual)
-    for r in df["decline_reason"].dropna().unique():
+    for r in stats["decline_reason"]:
         if r.lower().replace("_", " ") in q and r not in found_reasons:
             found_reasons.append(r)
 
     # ── Day / time extraction ─────────────────────────────────────────────────
+    # Day numbers without a month mean the latest month held; month names the
+    # latest such month up to the newest transaction
     day_range = None
+    latest_month = last_day.replace(day=1)
     m = re.search(r'last\s+(\d+)\s+day', q)
     if m:
         n = int(m.group(1))
-        max_day = int(df["day"].max())
-        day_range = (max(1, max_day - n + 1), max_day)
-    m = re.search(r'(?:nov(?:ember)?\s+)?day\s+(\d+)(?:\s*(?:to|-)\s*(\d+))?', q)
+        day_range = (last_day - datetime.timedelta(days=max(n, 1) - 1), last_day)
+    elif re.search(r'\b(?:last|past)\s+week\b', q):
+        day_range = (last_day - datetime.timedelta(days=6), last_day)
+    m = re.search(rf'(?:(?:{_MONTH_NAMES})\s+)?day\s+(\d+)(?:\s*(?:to|-)\s*(\d+))?', q)
     if m and not day_range:
         d1 = int(m.group(1))
         d2 = int(m.group(2)) if m.group(2) else d1
-        day_range = (d1, d2)
-    m = re.search(r'nov(?:ember)?\s+(\d+)(?:\s*(?:to|-)\s*(\d+))?', q)
+        day_range = _month_days(latest_month, d1, d2)
+    m = re.search(rf'\b({_MONTH_NAMES})\s+(\d+)(?:\s*(?:to|-)\s*(\d+))?', q)
     if m and not day_range:
-        d1 = int(m.group(1))
-        d2 = int(m.group(2)) if m.group(2) else d1
-        day_range = (d1, d2)
+        month = _MONTHS[m.group(1)[:3]]
+        year = last_day.year if month <= last_day.month else last_day.year - 1
+        d1 = int(m.group(2))
+        d2 = int(m.group(3)) if m.group(3) else d1
+        day_range = _month_days(datetime.date(year, month, 1), d1, d2)
     if re.search(r'first half|early month|nov 1.?15', q):
-        day_range = (1, 15)
+        day_range = _month_days(latest_month, 1, 15)
     elif re.search(r'second half|late month|nov 16.?30', q):
-        day_range = (16, 30)
+        day_range = _month_days(latest_month, 16, 31)
 
     # ── Amount extraction ─────────────────────────────────────────────────────
     amount_filter = None
@@ -709,70 +886,190 @@ def parse_query(query, df):
     elif re.search(r'\bdeclined?\b', q) and not re.search(r'\bapproved\b', q):
         approved_filter = False
 
-    # ── Apply filters ─────────────────────────────────────────────────────────
-    rdf = df.copy()
-    if found_countries:  rdf = rdf[rdf["country"].isin(found_countries)]
-    if found_processors: rdf = rdf[rdf["processor"].isin(found_processors)]
-    if found_methods:    rdf = rdf[rdf["payment_method"].isin(found_methods)]
-    if found_reasons:    rdf = rdf[rdf["decline_reason"].isin(found_reasons)]
-    if day_range:        rdf = rdf[rdf["day"].between(day_range[0], day_range[1])]
-    if approved_filter is True:  rdf = rdf[rdf["approved"]]
-    if approved_filter is False: rdf = rdf[~rdf["approved"]]
-    if amount_filter:
-        op, val = amount_filter
-        rdf = rdf[rdf["amount"] > val] if op == "gt" else rdf[rdf["amount"] < val]
-
-    any_filter = bool(found_countries or found_processors or found_methods or
-                      found_reasons or day_range or amount_filter or
-                      approved_filter is not None)
-
-    # ── Question answering ────────────────────────────────────────────────────
-    answer = None
-    n = len(rdf)
-    rate = rdf["approved_int"].mean() * 100 if n > 0 else 0
-    dec_df = rdf[~rdf["approved"]]
-
+    # ── Intent ────────────────────────────────────────────────────────────────
+    intent = None
     if re.search(r'how many|count|total', q):
         if re.search(r'\bdeclined?\b', q):
-            answer = f"**{len(dec_df):,}** declined transactions"
+            intent = "count_declined"
         elif re.search(r'\bapproved\b', q):
-            answer = f"**{int(rdf['approved'].sum()):,}** approved transactions"
+            intent = "count_approved"
         else:
-            answer = f"**{n:,}** transactions matched"
+            intent = "count"
     elif re.search(r'approval rate|what.*(rate|percent)', q):
-        answer = f"Approval rate: **{rate:.1f}%** across {n:,} transactions"
+        intent = "rate"
     elif re.search(r'top decline|main (decline|reason)|why.*declin|most common', q):
-        if not dec_df.empty:
-            vc = dec_df["decline_reason"].value_counts()
-            answer = f"Top decline reason: **{vc.index[0]}** — {vc.iloc[0]:,} times ({vc.iloc[0]/vc.sum()*100:.0f}% of declines)"
+        intent = "top_decline"
     elif re.search(r'average|avg|mean.*amount', q):
-        answer = f"Average transaction amount: **${rdf['amount'].mean():.2f}**"
+        intent = "avg_amount"
     elif re.search(r'total volume|revenue|total amount', q):
-        answer = f"Total volume: **${rdf['amount'].sum():,.0f}**"
+        intent = "volume"
     elif re.search(r'best processor|which processor', q):
+        intent = "best_processor"
+    metric = None
+    if group_by:
+        metric = _GROUP_METRICS.get(intent)
+        if metric is None:
+            metric = "volume" if re.search(r'volume|revenue', q) else "declined" if "declin" in q else "total"
+
+    # Filter lists are sorted, so differently worded questions share one plan
+    return {
+        "countries": sorted(found_countries), "processors": sorted(found_processors),
+        "methods": sorted(found_methods), "reasons": sorted(found_reasons),
+        "days": _ords(day_range) if day_range else None,
+        "approved": approved_filter, "amount": amount_filter, "intent": intent,
+        "group_by": group_by, "metric": metric,
+    }
+
+
+def _plan_members(plan):
+    """The plan's value filters as ``cube.slice_cells`` members (None skips a dimension)."""
+    approved = plan["approved"]
+    return dict(
+        country=plan["countries"] or None, processor=plan["processors"] or None,
+        payment_method=plan["methods"] or None, decline_reason=plan["reasons"] or None,
+        approved=None if approved is None else [approved],
+    )
+
+
+def group_query_plan(plan, cells):
+    """Small per-group table answering a "by <dimension>" question, from the plan's matching cells."""
+    by, metric = plan["group_by"], plan["metric"]
+    table = cube.rollup(cells, by)
+    if table.empty:
+        return None
+    table["avg_amount"] = table["volume"] / table["total"]
+    if metric == "top_reason":
+        top = cube.top_values(cells, by, "decline_reason", declined_only=True)
+        table["top_reason"] = top.reindex(table[by]).fillna("N/A").to_numpy()
+    if by in ("hour", "day_ord", "amount_bin"):
+        table = table.sort_values(by)
+    else:
+        table = table.sort_values("declined" if metric == "top_reason" else metric, ascending=False)
+    if by == "day_ord":
+        table[by] = table[by].map(ingest.ordinal_to_date)
+    cols = [by, metric] + (["declined"] if metric == "top_reason" else [] if metric == "total" else ["total"])
+    return table[cols].reset_index(drop=True)
+
+
+def _grouped_answer(plan, table):
+    by, metric = plan["group_by"], plan["metric"]
+    label = f"{_METRIC_LABELS[metric].split(' (')[0]} by {_GROUP_LABELS[by]}"
+    if metric == "top_reason":
+        return f"{label}: **{len(table)}** groups"
+    fmt = {"approval_rate": "{:.1f}%", "volume": "${:,.0f}", "avg_amount": "${:.2f}"}.get(metric, "{:,.0f}")
+    hi, lo = table.loc[table[metric].idxmax()], table.loc[table[metric].idxmin()]
+    return (f"{label}: highest **{hi[by]}** ({fmt.format(hi[metric])}), "
+            f"lowest **{lo[by]}** ({fmt.format(lo[metric])})")
+
+
+def _row_totals(rows, by_processor=False):
+    """Count, approvals, amount and top decline reason of the matched rows."""
+    approved = rows["approved"]
+    totals = {
+        "n": len(rows), "approved": int(approved.sum()), "amount_cents": int(rows["amount_cents"].sum()),
+        "top": group_mode.mode(rows.where(~approved)["decline_reason"]),
+    }
+    if by_processor:
+        pg = rows.frame(["processor", "approved"]).groupby("processor", observed=True)["approved"].mean()
+        totals["processor_rates"] = pg * 100
+    return totals
+
+
+def _cell_totals(cells, by_processor=False):
+    """``_row_totals`` of the rows behind ``cells``."""
+    dec = cells[~cells["approved"]]
+    totals = {
+        "n": int(cells["count"].sum()), "approved": int(cells["approved_n"].sum()),
+        "amount_cents": int(cells["amount_cents"].sum()),
+        "top": group_mode.mode(dec["decline_reason"], weights=dec["count"]),
+    }
+    if by_processor:
+        totals["processor_rates"] = cube.rollup(cells, "processor").set_index("processor")["approval_rate"]
+    return totals
+
+
+def run_query_plan(plan, df, index, cells, db=None):
+    """The answer to ``plan``, the totals of its matches and the matches themselves.
+
+    Rows are a selection over ``df`` (never a copy); with SQLite (``db``) the
+    matches are aggregated in SQL and the rows are a lazy ``RowQuery``.
+    """
+    members = _plan_members(plan)
+    amount = None if plan["amount"] is None else (plan["amount"][0], plan["amount"][1] * 100)
+    best_processor = plan["intent"] == "best_processor" and not plan["group_by"]
+    if db is not None:
+        match_cells = db.cube_cells(plan["days"], amount=amount, **members)
+        totals = _cell_totals(match_cells, best_processor)
+        matches = {"rows": db.rows(plan["days"], amount=amount, **members)}
+    else:
+        # Same bitmap engine as the sidebar: OR within a dimension, AND across them
+        bits = index.select(**members)
+        if plan["days"]:
+            bits &= index.span(*ingest.day_bounds(df["day_ord"], plan["days"]))
+        rows = row_view.RowView(df, index.to_selection(bits))
+        if amount:
+            op, cents = amount
+            rows = rows.where(rows["amount_cents"] > cents if op == "gt" else rows["amount_cents"] < cents)
+        totals = _row_totals(rows, best_processor)
+        matches = {"fdf_rows": rows.rows}
+        if not plan["group_by"]:
+            match_cells = None
+        elif amount:
+            # Amount thresholds cut across the cube's brackets: aggregate just the selected rows
+            match_cells = cube.build_cube(rows.frame(cube.DIMENSIONS + ["amount_cents"]))
+        else:
+            match_cells = cube.slice_cells(cells, days=plan["days"], **members)
+
+    any_filter = bool(plan["countries"] or plan["processors"] or plan["methods"] or
+                      plan["reasons"] or plan["days"] or plan["amount"] or
+                      plan["approved"] is not None)
+
+    # ── Question answering ────────────────────────────────────────────────────
+    answer = None
+    intent = None if plan["group_by"] else plan["intent"]
+    n = totals["n"]
+    rate = totals["approved"] / n * 100 if n > 0 else 0
+
+    if intent == "count_declined":
+        answer = f"**{n - totals['approved']:,}** declined transactions"
+    elif intent == "count_approved":
+        answer = f"**{totals['approved']:,}** approved transactions"
+    elif intent == "count":
+        answer = f"**{n:,}** transactions matched"
+    elif intent == "rate":
+        answer = f"Approval rate: **{rate:.1f}%** across {n:,} transactions"
+    elif intent == "top_decline":
+        reason, count, total = totals["top"]
+        if reason is not None:
+            answer = f"Top decline reason: **{reason}** — {count:,} times ({count/total*100:.0f}% of declines)"
+    elif intent == "avg_amount":
+        avg = totals["amount_cents"] / n / 100 if n else float("nan")
+        answer = f"Average transaction amount: **${avg:.2f}**"
+    elif intent == "volume":
+        answer = f"Total volume: **${totals['amount_cents'] / 100:,.0f}**"
+    elif intent == "best_processor":
         if n > 0:
-            pg = rdf.groupby("processor")["approved_int"].mean() * 100
+            pg = totals["processor_rates"]
             best = pg.idxmax()
             answer = f"Best processor in this view: **{best}** at {pg.max():.1f}% approval"
 
-    return {
-        "filtered_df": rdf,
-        "answer": answer,
-        "any_filter": any_filter,
-        "filters": {
-            "countries": found_countries, "processors": found_processors,
-            "methods": found_methods, "reasons": found_reasons,
-            "day_range": day_range, "approved": approved_filter,
-            "amount": amount_filter,
-        },
-    }
+    # Grouped questions are answered from the cube, not the rows
+    grouped = None
+    if plan["group_by"]:
+        grouped = group_query_plan(plan, match_cells)
+        answer = None if grouped is None else _grouped_answer(plan, grouped)
+
+    # Like a cached view, the matches are kept as positions into ``df``, not a frame
+    return {"answer": answer, "any_filter": any_filter, "grouped": grouped,
+            "totals": totals, **matches}
 
 
-def render_data_results(query, parsed):
-    rdf  = parsed["filtered_df"]
-    n    = len(rdf)
-    rate = rdf["approved_int"].mean() * 100 if n > 0 else 0
-    dec  = int((~rdf["approved"]).sum()) if n > 0 else 0
+def render_data_results(query, parsed, df):
+    totals = parsed["totals"]
+    rows = parsed["rows"] if "rows" in parsed else row_view.RowView(df, parsed["fdf_rows"])
+    n    = totals["n"]
+    rate = totals["approved"] / n * 100 if n > 0 else 0
+    dec  = n - totals["approved"]
 
     # Answer card (question detected)
     if parsed["answer"]:
@@ -784,10 +1081,29 @@ def render_data_results(query, parsed):
           <div style="font-size:0.72rem;color:#9CA3AF;margin-top:6px;">Based on {n:,} matching transactions</div>
         </div>""", unsafe_allow_html=True)
 
+    # Grouped answer ("… by <dimension>"): small chart + table
+    grouped = parsed["grouped"]
+    if grouped is not None:
+        by, metric = grouped.columns[:2]
+        table = grouped.rename(columns={by: _GROUP_LABELS[by].title(), **_METRIC_LABELS})
+        if metric == "top_reason":
+            st.dataframe(table, use_container_width=True, hide_index=True)
+        else:
+            g1, g2 = st.columns([3, 2])
+            with g1:
+                fig = px.bar(grouped, x=by, y=metric, color_discrete_sequence=["#6C5CE7"])
+                fig.update_layout(height=280, margin=dict(t=10, b=10, l=10, r=10),
+                                  xaxis_title=_GROUP_LABELS[by].title(), yaxis_title=_METRIC_LABELS[metric])
+                if by != "day_ord":
+                    fig.update_xaxes(type="category")
+                _plot(fig, use_container_width=True)
+            with g2:
+                st.dataframe(table, use_container_width=True, hide_index=True, height=280)
+
     # Mini KPI row
     if n > 0:
-        top_dec = rdf[~rdf["approved"]]["decline_reason"].value_counts()
-        top_dec_label = f"{top_dec.index[0].replace('_',' ')} ({top_dec.iloc[0]/top_dec.sum()*100:.0f}%)" if not top_dec.empty else "—"
+        reason, count, total = totals["top"]
+        top_dec_label = f"{reason.replace('_',' ')} ({count/total*100:.0f}%)" if reason is not None else "—"
         st.markdown(f"""
         <div style="display:flex;gap:10px;margin:0 0 12px;">
           <div style="flex:1;background:#FFFFFF;border:1px solid #E5E7EB;border-radius:10px;
@@ -818,16 +1134,16 @@ def render_data_results(query, parsed):
                       padding:12px 14px;box-shadow:0 1px 4px rgba(28,20,51,0.05);">
             <div style="font-size:0.65rem;color:#6B7280;text-transform:uppercase;
                         letter-spacing:0.07em;font-weight:700;">Avg Amount</div>
-            <div style="font-size:1.4rem;font-weight:800;color:#1C1433;">${rdf['amount'].mean():.0f}</div>
+            <div style="font-size:1.4rem;font-weight:800;color:#1C1433;">${totals['amount_cents'] / n / 100:.0f}</div>
           </div>
         </div>""", unsafe_allow_html=True)
 
         # Mini transaction table
         st.dataframe(
-            rdf.sort_values("timestamp", ascending=False).head(15)[[
+            ingest.expand_frame(rows.latest(15), [
                 "id", "timestamp", "country", "payment_method",
                 "processor", "amount", "approved", "decline_reason"
-            ]].reset_index(drop=True),
+            ]).reset_index(drop=True),
             use_container_width=True,
             height=280,
         )
@@ -840,85 +1156,45 @@ def render_data_results(query, parsed):
 
 
 # ── Smart fuzzy search (section navigation) ───────────────────────────────────
-def smart_search(query, df):
-    import difflib
+SECTION_KEYWORDS = [
+    (["what changed", "insight", "anomal", "alert"],         "#what-changed",    "📊", "What Changed",           "Auto-detected anomalies in current view"),
+    (["recommend", "action", "next step", "fix"],            "#recommendations", "💡", "Smart Recommendations",  "Actionable steps based on data"),
+    (["what if", "simulat", "rout", "redirect"],             "#what-if",         "🔀", "What-If Simulator",      "Estimate impact of routing decisions"),
+    (["cohort", "compar", "period", "before", "after"],      "#cohort",          "📅", "Cohort Comparison",      "Compare two time periods side by side"),
+    (["time", "trend", "daily", "hourly", "volume"],         "#time-trends",     "📈", "Time Trends",            "Daily volume & approval rate over time"),
+    (["geo", "map", "region", "country", "method"],          "#geography",       "🌍", "Geography & Methods",    "Approval rates by country & payment method"),
+    (["processor", "process", "acquirer"],                   "#processors",      "⚙️", "Processor Performance",  "Processor comparison & country breakdown"),
+    (["amount", "value", "bracket", "high value", "size"],   "#amounts",         "💰", "Amount Analysis",        "Approval by transaction size"),
+    (["declin", "reason", "fail", "fraud", "3ds",
+      "insufficient", "expired", "technical"],               "#declines",        "❌", "Decline Analysis",       "Decline reason breakdown"),
+    (["outage", "nov 18", "processor b", "deep dive"],       "#anomalies",       "🚨", "Anomaly Deep-Dives",     "Processor B outage & 3DS spike"),
+    (["transaction", "recent", "table", "list", "txn"],      "#transactions",    "🧾", "Recent Transactions",    "Sortable transaction table & export"),
+]
+
+
+def smart_search(query):
+    """"Jump to section" suggestions for the search bar, best first."""
     if not query or len(query.strip()) < 2:
         return []
     q = query.lower().strip().replace("_", " ")
     results = []
 
-    # ── 1. Transaction ID match ───────────────────────────────────────────────
-    if "txn" in q or q.replace(" ", "").replace("-", "").isdigit():
-        matches = df[df["id"].str.lower().str.contains(q.replace(" ", ""), na=False)].head(4)
-        for _, row in matches.iterrows():
-            status = "✅ Approved" if row["approved"] else f"❌ {row['decline_reason']}"
-            results.append({
-                "type": "transaction",
-                "icon": "🧾",
-                "label": row["id"],
-                "detail": f"{row['country']} · {row['payment_method']} · ${row['amount']:.2f} · {status}",
-                "link": "#transactions",
-                "score": 1.0,
-            })
-
-    # ── 2. Dimension value fuzzy match ────────────────────────────────────────
-    dim_config = [
-        ("country",         df["country"].unique(),                  "#geography",  "🌍"),
-        ("processor",       df["processor"].unique(),                 "#processors", "⚙️"),
-        ("payment_method",  df["payment_method"].unique(),            "#geography",  "💳"),
-        ("decline_reason",  df["decline_reason"].dropna().unique(),   "#declines",   "❌"),
-    ]
-    for dim, values, link, icon in dim_config:
-        for val in values:
-            val_norm = val.lower().replace("_", " ")
-            score = 0.0
-            if q in val_norm or val_norm in q:
-                score = 0.95
-            elif any(w in val_norm for w in q.split() if len(w) > 2):
-                score = 0.78
-            else:
-                score = difflib.SequenceMatcher(None, q, val_norm).ratio()
-            if score > 0.45:
-                sub   = df[df[dim] == val]
-                rate  = sub["approved_int"].mean() * 100
-                count = len(sub)
-                dec   = int((~sub["approved"]).sum())
-                results.append({
-                    "type":   "filter",
-                    "icon":   icon,
-                    "label":  val.replace("_", " ").title(),
-                    "detail": f"{rate:.0f}% approval · {count:,} transactions · {dec:,} declined",
-                    "link":   link,
-                    "score":  score,
-                })
-
-    # ── 3. Section / keyword match ────────────────────────────────────────────
-    section_keywords = [
-        (["what changed", "insight", "anomal", "alert"],         "#what-changed",    "📊", "What Changed",           "Auto-detected anomalies in current view"),
-        (["recommend", "action", "next step", "fix"],            "#recommendations", "💡", "Smart Recommendations",  "Actionable steps based on data"),
-        (["what if", "simulat", "rout", "redirect"],             "#what-if",         "🔀", "What-If Simulator",      "Estimate impact of routing decisions"),
-        (["cohort", "compar", "period", "before", "after"],      "#cohort",          "📅", "Cohort Comparison",      "Compare two time periods side by side"),
-        (["time", "trend", "daily", "hourly", "volume"],         "#time-trends",     "📈", "Time Trends",            "Daily volume & approval rate over time"),
-        (["geo", "map", "region", "country", "method"],          "#geography",       "🌍", "Geography & Methods",    "Approval rates by country & payment method"),
-        (["processor", "process", "acquirer"],                   "#processors",      "⚙️", "Processor Performance",  "Processor comparison & country breakdown"),
-        (["amount", "value", "bracket", "high value", "size"],   "#amounts",         "💰", "Amount Analysis",        "Approval by transaction size"),
-        (["declin", "reason", "fail", "fraud", "3ds",
-          "insufficient", "expired", "technical"],               "#declines",        "❌", "Decline Analysis",       "Decline reason breakdown"),
-        (["outage", "nov 18", "processor b", "deep dive"],       "#anomalies",       "🚨", "Anomaly Deep-Dives",     "Processor B outage & 3DS spike"),
-        (["transaction", "recent", "table", "list", "txn"],      "#transactions",    "🧾", "Recent Transactions",    "Sortable transaction table & export"),
-    ]
-    for keywords, link, icon, title, desc in section_keywords:
+    # ── 1. Section / keyword match ────────────────────────────────────────────
+    # Ratios at or below 0.42 / 0.82 can never make a section's cut, so they are skipped
+    all_keywords = tuple(kw for keywords, *_ in SECTION_KEYWORDS for kw in keywords)
+    kw_ratio = dict(zip(all_keywords, fuzzy.matcher(all_keywords).scores(q, 0.42 / 0.82)))
+    for keywords, link, icon, title, desc in SECTION_KEYWORDS:
         best = 0.0
         for kw in keywords:
             if kw in q:
                 best = max(best, 0.88)
             else:
-                best = max(best, difflib.SequenceMatcher(None, q, kw).ratio() * 0.82)
+                best = max(best, kw_ratio[kw] * 0.82)
         if best > 0.42:
             results.append({"type": "section", "icon": icon, "label": title,
                              "detail": desc, "link": link, "score": best})
 
-    # ── 4. Deduplicate & sort ─────────────────────────────────────────────────
+    # ── 2. Deduplicate & sort ─────────────────────────────────────────────────
     seen, unique = set(), []
     for r in sorted(results, key=lambda x: -x["score"]):
         if r["label"] not in seen:
@@ -974,38 +1250,41 @@ def render_search_results(query, results):
     </div>""", unsafe_allow_html=True)
 
 
-# ── Live alerts banner (auto-refreshes every 60s) ────────────────────────────
-@st.fragment(run_every=60)
+# ── Live alerts banner (auto-refreshes every 60s, 5s when tailing a log) ─────
+@st.fragment(run_every=5 if LIVE_LOG_PATH else 60)
 def live_alerts_banner():
     import datetime
-    now = df["timestamp"].max()
-    window_start = now - pd.Timedelta(hours=3)
-    prev_start   = window_start - pd.Timedelta(hours=3)
-
-    recent   = df[df["timestamp"] >= window_start]
-    previous = df[(df["timestamp"] >= prev_start) & (df["timestamp"] < window_start)]
+    # Only rows that arrived since the last refresh are folded into the buckets
+    if LIVE_LOG_PATH:
+        window = load_alert_window(LIVE_LOG_PATH)
+        load_live_store(LIVE_LOG_PATH).poll()  # new lines reach the window via its subscription
+    else:
+        window = load_alert_window(data_version)
+        if PARTS_PATH:
+            window.update(load_parts_recent(data_version, parts))
+        elif DB_PATH:
+            window.update(load_db_recent(data_version, db))
+        else:
+            window.update(df)
+    recent, previous = window.windows()
 
     alerts = []
 
-    if len(recent) >= 5:
-        recent_rate = recent["approved_int"].mean() * 100
+    if recent.total >= 5:
+        recent_rate = recent.rate
 
         # Processor outage: <30% approval with at least 5 transactions
-        proc_rates = recent.groupby("processor").agg(
-            total=("id", "count"), approved=("approved_int", "sum")
-        ).reset_index()
-        proc_rates["rate"] = proc_rates["approved"] / proc_rates["total"] * 100
-        for _, row in proc_rates.iterrows():
-            if row["total"] >= 5 and row["rate"] < 30:
-                dec_sub = recent[(recent["processor"] == row["processor"]) & ~recent["approved"]]
-                top_r = dec_sub["decline_reason"].value_counts()
-                top_label = f" — {top_r.index[0]} ({top_r.iloc[0]/len(dec_sub)*100:.0f}% of declines)" if not top_r.empty else ""
+        for proc, (total, approved, reasons) in sorted(recent.processors.items()):
+            rate = approved / total * 100
+            if total >= 5 and rate < 30:
+                reason, count = alert_window.top_reason(reasons)
+                top_label = f" — {reason} ({count/(total - approved)*100:.0f}% of declines)" if count else ""
                 alerts.append({"level": "critical",
-                    "msg": f"🔴 &nbsp;<b>OUTAGE — {row['processor']}</b>: {row['rate']:.0f}% approval in last 3h ({int(row['total'])} txns){top_label}"})
+                    "msg": f"🔴 &nbsp;<b>OUTAGE — {proc}</b>: {rate:.0f}% approval in last 3h ({total} txns){top_label}"})
 
         # Overall rate drop vs previous 3h window
-        if len(previous) >= 5:
-            prev_rate = previous["approved_int"].mean() * 100
+        if previous.total >= 5:
+            prev_rate = previous.rate
             drop = prev_rate - recent_rate
             if drop > 15:
                 lvl = "critical" if drop > 25 else "warning"
@@ -1014,26 +1293,24 @@ def live_alerts_banner():
                     "msg": f"{icon} &nbsp;<b>Approval rate falling</b>: {recent_rate:.0f}% now vs {prev_rate:.0f}% in prior window (−{drop:.0f}pp)"})
 
         # Decline reason spike: one reason >55% of all declines
-        dec_recent = recent[~recent["approved"]]
-        if len(dec_recent) >= 5:
-            vc = dec_recent["decline_reason"].value_counts()
-            top_pct = vc.iloc[0] / vc.sum() * 100
+        if recent.declined >= 5:
+            reason, count = alert_window.top_reason(recent.reasons)
+            top_pct = count / sum(n for r, n in recent.reasons.items() if r is not None) * 100
             if top_pct > 55:
                 alerts.append({"level": "warning",
-                    "msg": f"🟡 &nbsp;<b>{vc.index[0]} spike</b>: {top_pct:.0f}% of recent declines — possible systemic issue"})
+                    "msg": f"🟡 &nbsp;<b>{reason} spike</b>: {top_pct:.0f}% of recent declines — possible systemic issue"})
 
         # High-value drop: >$400 transactions with <40% approval
-        hv = recent[recent["amount"] > 400]
-        if len(hv) >= 5:
-            hv_rate = hv["approved_int"].mean() * 100
+        if recent.hv_total >= 5:
+            hv_rate = recent.hv_approved / recent.hv_total * 100
             if hv_rate < 40:
                 alerts.append({"level": "warning",
-                    "msg": f"🟡 &nbsp;<b>High-value transactions struggling</b>: {hv_rate:.0f}% approval on {len(hv)} transactions >$400"})
+                    "msg": f"🟡 &nbsp;<b>High-value transactions struggling</b>: {hv_rate:.0f}% approval on {recent.hv_total} transactions >$400"})
     else:
         recent_rate = 0
 
     last_refresh = datetime.datetime.now().strftime("%H:%M:%S")
-    n_recent = len(recent)
+    n_recent = recent.total
 
     if alerts:
         is_critical = any(a["level"] == "critical" for a in alerts)
@@ -1068,15 +1345,22 @@ def _qp_list(key, all_opts):
     valid = [v for v in vals if v in all_opts]
     return valid if valid else list(all_opts)
 
-def _qp_range(key):
-    raw = st.query_params.get(key, "")
-    if raw:
-        try:
-            a, b = raw.split("-", 1)
-            return (max(1, int(a)), min(30, int(b)))
-        except (ValueError, AttributeError):
-            pass
-    return (1, 30)
+def _qp_dates(key):
+    """``2023-11-10..2023-11-25`` clamped to the data span; older links' ``days=10-25``
+    are read as days of the first month."""
+    first, last = data_span
+    raw, legacy = st.query_params.get(key, ""), st.query_params.get("days", "")
+    try:
+        if raw:
+            a, b = (datetime.date.fromisoformat(v) for v in raw.split("..", 1))
+        elif legacy:
+            a, b = (first.replace(day=1) + datetime.timedelta(days=int(v) - 1) for v in legacy.split("-", 1))
+        else:
+            return data_span
+    except (ValueError, AttributeError):
+        return data_span
+    a, b = sorted((min(max(a, first), last), min(max(b, first), last)))
+    return (a, b)
 
 # ── Sidebar filters ───────────────────────────────────────────────────────────
 st.sidebar.image("Yuno logo.png", use_container_width=True)
@@ -1086,15 +1370,25 @@ st.sidebar.markdown(
     unsafe_allow_html=True
 )
 
-_all_countries  = sorted(df["country"].unique())
-_all_processors = sorted(df["processor"].unique())
-_all_methods    = sorted(df["payment_method"].unique())
+def _dim_values(dim):
+    # A partitioned dataset lists its values in the manifest, before any rows are read;
+    # SQLite keeps them in its ``dim_values`` table
+    if PARTS_PATH:
+        return parts.categories(dim)
+    if DB_PATH:
+        return db.categories(dim)
+    return sorted(df[dim].dropna().unique())
+
+
+_all_countries  = _dim_values("country")
+_all_processors = _dim_values("processor")
+_all_methods    = _dim_values("payment_method")
 _all_amounts    = ["$0–50", "$50–200", "$200–500", "$500+"]
-_all_reasons    = sorted(df["decline_reason"].dropna().unique())
+_all_reasons    = _dim_values("decline_reason")
 
 with st.sidebar.expander("📅  Date Range"):
-    day_range = st.slider("Day of November", 1, 30, _qp_range("days"), label_visibility="collapsed")
-    st.caption(f"Nov {day_range[0]} – {day_range[1]}")
+    date_range = _date_slider("Date range", _qp_dates("dates"), label_visibility="collapsed")
+    st.caption(_fmt_span(*date_range, sep=" – "))
 
 with st.sidebar.expander("🌍  Country"):
     countries = st.multiselect("Country", _all_countries,
@@ -1144,7 +1438,7 @@ if active_drills:
 
 # ── Sync current state back to URL (makes every view shareable) ───────────────
 _url_params = {
-    "days":       f"{day_range[0]}-{day_range[1]}",
+    "dates":      f"{date_range[0].isoformat()}..{date_range[1].isoformat()}",
     "countries":  ",".join(countries),
     "processors": ",".join(processors),
     "methods":    ",".join(methods),
@@ -1158,7 +1452,7 @@ if st.session_state.drill_processor:
 if st.session_state.drill_method:
     _url_params["drill_method"] = st.session_state.drill_method
 st.query_params.update(_url_params)
-for _dk in ["drill_country", "drill_processor", "drill_method"]:
+for _dk in ["days", "drill_country", "drill_processor", "drill_method"]:
     if not st.session_state.get(_dk) and _dk in st.query_params:
         del st.query_params[_dk]
 
@@ -1167,23 +1461,94 @@ st.sidebar.markdown("**Share this view**")
 st.sidebar.caption("The browser URL updates with every filter change. Copy it to share this exact view.")
 
 # ── Apply sidebar filters ─────────────────────────────────────────────────────
-overview_df = df[
-    df["day"].between(day_range[0], day_range[1]) &
-    df["country"].isin(countries) &
-    df["processor"].isin(processors) &
-    df["payment_method"].isin(methods) &
-    df["amount_bin"].isin(amount_bins)
-].copy()
-overview_df = overview_df[overview_df["approved"] | overview_df["decline_reason"].isin(decline_reasons)]
-
-# Apply click drill-downs for detail views
-fdf = overview_df.copy()
-if st.session_state.drill_country:
-    fdf = fdf[fdf["country"] == st.session_state.drill_country]
-if st.session_state.drill_processor:
-    fdf = fdf[fdf["processor"] == st.session_state.drill_processor]
-if st.session_state.drill_method:
-    fdf = fdf[fdf["payment_method"] == st.session_state.drill_method]
+days = _ords(date_range)
+if PARTS_PATH:
+    # Partition pruning: only the days on the slider are read from disk
+    df = load_parts_range(data_version, days, parts)
+    cells = load_parts_cells(data_version, days, parts)
+    rows_version = f"{data_version}:{days[0]}-{days[1]}"
+    index = load_bitmap_index(rows_version, df)
+
+
+def _narrow(values, drill):
+    return values if drill is None else [v for v in values if v in drill]
+
+
+def build_view():
+    # Click drill-downs narrow the detail views on top of the sidebar filters
+    drill = {
+        "country": [st.session_state.drill_country] if st.session_state.drill_country else None,
+        "processor": [st.session_state.drill_processor] if st.session_state.drill_processor else None,
+        "payment_method": [st.session_state.drill_method] if st.session_state.drill_method else None,
+    }
+    if DB_PATH:
+        # Pushed down to SQLite as one WHERE clause over the indexed columns: the cells
+        # are aggregated in SQL, and rows are only read by the tables and the export
+        filters = dict(days=days, reasons=decline_reasons, country=countries, processor=processors,
+                       payment_method=methods, amount_bin=amount_bins)
+        drilled = {**filters, **{dim: _narrow(filters[dim], values) for dim, values in drill.items()}}
+        overview_cells = load_db_cells(data_version, db, **filters)
+        fcells = cube.slice_cells(overview_cells, **drill)
+        fctx = analysis.CubeContext(
+            fcells, db.cube_cells(amount=("gt", analysis.HIGH_VALUE_CENTS), **drilled),
+            db.processor_order(**drilled), split_ord=split_ord,
+        )
+        view = {"rows": db.rows(**drilled)}
+    else:
+        # OR within a dimension, AND across dimensions — on bitmaps, not row masks
+        overview_bits = index.select(
+            country=countries, processor=processors,
+            payment_method=methods, amount_bin=amount_bins,
+        )
+        # Rows are time-sorted: the date range is one contiguous span, found by binary search
+        overview_bits &= index.span(*ingest.day_bounds(df["day_ord"], days))
+        overview_bits &= index.any_of("approved", [True]) | index.any_of("decline_reason", decline_reasons)
+        fdf_rows = index.to_selection(overview_bits & index.select(**drill))
+        # Insight and recommendation engines share one set of lazily built aggregates
+        fctx = analysis.AnalysisContext(row_view.RowView(df, fdf_rows), split_ord=split_ord)
+        view = {"fdf_rows": fdf_rows}
+
+        # Same filters on the pre-aggregated cube — charts and KPIs read these cells
+        overview_cells = cube.slice_cells(
+            cells, days=days, reasons=decline_reasons,
+            country=countries, processor=processors,
+            payment_method=methods, amount_bin=amount_bins,
+        )
+        fcells = cube.slice_cells(overview_cells, **drill)
+    view.update(
+        overview_cells=overview_cells,
+        fcells=fcells,
+        insights=generate_insights(fctx),
+        recs=generate_recommendations(fctx),
+    )
+    return view
+
+
+# Views are shared across sessions: returning to a seen filter state is a lookup
+view_signature = view_cache.filter_signature(
+    data_version, date_range,
+    countries=countries, processors=processors, methods=methods,
+    amount_bins=amount_bins, decline_reasons=decline_reasons,
+    drill={k: st.session_state[k] for k in ("drill_country", "drill_processor", "drill_method")},
+)
+view = load_view_cache().get_or_build(view_signature, build_view)
+# The filtered rows stay a selection over ``df`` (or a query on SQLite): sections read only what they show
+frows = view["rows"] if "rows" in view else row_view.RowView(df, view["fdf_rows"])
+overview_cells = view["overview_cells"]
+fcells = view["fcells"]
+
+
+def view_cells(days=None, **members):
+    """``overview_cells`` narrowed further; on SQLite the combined filters are pushed down."""
+    if not DB_PATH:
+        return cube.slice_cells(overview_cells, days=days, **members)
+    sidebar = dict(country=countries, processor=processors, payment_method=methods, amount_bin=amount_bins)
+    combined = {dim: _narrow(values, members.get(dim)) for dim, values in sidebar.items()}
+    lo, hi = _ords(date_range)
+    if days is not None:
+        lo, hi = max(days[0], lo), min(days[1], hi)
+    return load_db_cells(data_version, db, days=(lo, hi), reasons=decline_reasons, **combined)
+
 
 # ── Title & KPIs ──────────────────────────────────────────────────────────────
 st.markdown(f"""
@@ -1198,9 +1563,9 @@ st.markdown(f"""
       </div>
     </div>
     <div style="display:flex;gap:8px;flex-wrap:wrap;">
-      <span style="background:rgba(202,255,0,0.12);border:1px solid rgba(202,255,0,0.28);color:#CAFF00;font-size:0.7rem;font-weight:700;padding:3px 10px;border-radius:20px;letter-spacing:0.04em;">November 2023</span>
-      <span style="background:rgba(255,255,255,0.06);border:1px solid rgba(255,255,255,0.12);color:#D8D5E8;font-size:0.7rem;font-weight:600;padding:3px 10px;border-radius:20px;">Nov {day_range[0]}–{day_range[1]}</span>
-      <span style="background:rgba(255,255,255,0.06);border:1px solid rgba(255,255,255,0.12);color:#D8D5E8;font-size:0.7rem;font-weight:600;padding:3px 10px;border-radius:20px;">6,000 transactions · Mock data</span>
+      <span style="background:rgba(202,255,0,0.12);border:1px solid rgba(202,255,0,0.28);color:#CAFF00;font-size:0.7rem;font-weight:700;padding:3px 10px;border-radius:20px;letter-spacing:0.04em;">{span_label}</span>
+      <span style="background:rgba(255,255,255,0.06);border:1px solid rgba(255,255,255,0.12);color:#D8D5E8;font-size:0.7rem;font-weight:600;padding:3px 10px;border-radius:20px;">{_fmt_span(*date_range)}</span>
+      <span style="background:rgba(255,255,255,0.06);border:1px solid rgba(255,255,255,0.12);color:#D8D5E8;font-size:0.7rem;font-weight:600;padding:3px 10px;border-radius:20px;">{row_total:,} transactions · {data_source}</span>
     </div>
   </div>
 </div>
@@ -1259,7 +1624,22 @@ components.html("""
 """, height=1, scrolling=False)
 
 if search_query and len(search_query.strip()) >= 2:
-    parsed = parse_query(search_query, df)
+    # Query text -> plan -> result, each cached per rows version: a repeated question,
+    # or a differently worded one that compiles to the same plan, is a lookup
+    query_cache = load_query_cache()
+    if DB_PATH:
+        search_stats = load_db_value_stats(data_version, db)
+    else:
+        search_stats = load_value_stats(rows_version, cells)
+    last_day = ingest.ordinal_to_date(df["day_ord"].iloc[-1]) if df is not None and len(df) else data_span[1]
+    plan = query_cache.get_or_build(
+        ("plan", rows_version, search_query.lower().strip()),
+        lambda: plan_query(search_query, search_stats, last_day),
+    )
+    plan_signature = view_cache.filter_signature(
+        rows_version, plan["days"] or (), **{k: v for k, v in plan.items() if k != "days"})
+    parsed = query_cache.get_or_build(
+        plan_signature, lambda: run_query_plan(plan, df, index, cells, db=db if DB_PATH else None))
 
     if parsed["any_filter"] or parsed["answer"]:
         # Show live data results first
@@ -1268,11 +1648,10 @@ if search_query and len(search_query.strip()) >= 2:
             f'letter-spacing:0.08em;margin-bottom:8px;">Live results for "{search_query}"</div>',
             unsafe_allow_html=True
         )
-        render_data_results(search_query, parsed)
+        render_data_results(search_query, parsed, df)
 
     # Always show section navigation cards below
-    nav_results = smart_search(search_query, df)
-    nav_results = [r for r in nav_results if r["type"] == "section"]
+    nav_results = smart_search(search_query)
     if nav_results:
         st.markdown(
             '<div style="font-size:0.68rem;color:#9CA3AF;font-weight:700;text-transform:uppercase;'
@@ -1293,11 +1672,12 @@ if active_drills:
     drill_str = " · ".join(f"{k}: **{v}**" for k, v in active_drills.items())
     st.info(f"Drill-down active — {drill_str}. Click **Clear click filters** in the sidebar to reset.")
 
-total = len(fdf)
-approved_n = int(fdf["approved"].sum())
-declined_n = total - approved_n
-approval_rate = approved_n / total * 100 if total else 0
-total_volume = fdf["amount"].sum()
+kpi = cube.totals(fcells)
+total = kpi["total"]
+approved_n = kpi["approved"]
+declined_n = kpi["declined"]
+approval_rate = kpi["rate"]
+total_volume = kpi["volume"]
 
 st.markdown(f"""
 <style>
@@ -1427,7 +1807,7 @@ st.markdown("""
 
 # ── What Changed? ─────────────────────────────────────────────────────────────
 st.markdown('<div id="what-changed"></div>', unsafe_allow_html=True)
-insights = generate_insights(fdf)
+insights = view["insights"]
 if insights:
     st.subheader("What Changed? — Auto-detected Insights")
     st.caption(f"{len(insights)} anomaly/insight{'s' if len(insights) != 1 else ''} detected in current view")
@@ -1442,7 +1822,7 @@ st.divider()
 
 # ── Smart Recommendations ─────────────────────────────────────────────────────
 st.markdown('<div id="recommendations"></div>', unsafe_allow_html=True)
-recs = generate_recommendations(fdf)
+recs = view["recs"]
 if recs:
     st.subheader("Smart Recommendations")
     st.caption(f"{len(recs)} action{'s' if len(recs) != 1 else ''} suggested based on current data patterns")
@@ -1467,7 +1847,9 @@ with w2:
     sim_target_opts = [p for p in _all_processors if p != sim_source]
     sim_target = st.selectbox("Route to", sim_target_opts, key="sim_target")
 with w3:
-    sim_days = st.slider("During Nov days", 1, 30, (18, 18), key="sim_days")
+    # Defaults to the 18th of the first month: the Processor B outage in the bundled data
+    _sim_day = min(max(data_span[0].replace(day=18), data_span[0]), data_span[1])
+    sim_days = _date_slider("During", (_sim_day, _sim_day), key="sim_days")
 
 w4, w5 = st.columns(2)
 with w4:
@@ -1476,36 +1858,25 @@ with w5:
     sim_methods = st.multiselect("Limit to methods (blank = all)", _all_methods, key="sim_methods")
 
 # ── Build simulation ──────────────────────────────────────────────────────────
-affected = overview_df[
-    (overview_df["processor"] == sim_source) &
-    (overview_df["day"].between(sim_days[0], sim_days[1]))
-].copy()
-if sim_countries:
-    affected = affected[affected["country"].isin(sim_countries)]
-if sim_methods:
-    affected = affected[affected["payment_method"].isin(sim_methods)]
-
-target_df = overview_df[overview_df["processor"] == sim_target]
-target_overall = target_df["approved_int"].mean() if len(target_df) > 0 else 0.75
+affected = view_cells(
+    days=_ords(sim_days), processor=[sim_source],
+    country=sim_countries or None, payment_method=sim_methods or None,
+)
+
+target_cells = view_cells(processor=[sim_target])
+target_kpi = cube.totals(target_cells)
+target_overall = target_kpi["approved"] / target_kpi["total"] if target_kpi["total"] > 0 else 0.75
 
 # Target rates by country × method × amount_bin
-target_rates = (
-    target_df.groupby(["country", "payment_method", "amount_bin"], observed=True)
-    .agg(approved_sum=("approved_int", "sum"), total=("id", "count"))
-    .reset_index()
-)
+target_rates = cube.rollup(target_cells, ["country", "payment_method", "amount_bin"])
 target_rates["rate"] = target_rates["approved_sum"] / target_rates["total"]
 
 # Target rates by country × method (fallback)
-target_rates_cm = (
-    target_df.groupby(["country", "payment_method"])
-    .agg(approved_sum=("approved_int", "sum"), total=("id", "count"))
-    .reset_index()
-)
+target_rates_cm = cube.rollup(target_cells, ["country", "payment_method"])
 target_rates_cm["rate_cm"] = target_rates_cm["approved_sum"] / target_rates_cm["total"]
 
 if len(affected) > 0:
-    # Merge granular rates
+    # Merge granular rates (one row per affected cube cell)
     sim_df = affected.merge(
         target_rates[["country", "payment_method", "amount_bin", "rate"]],
         on=["country", "payment_method", "amount_bin"], how="left"
@@ -1514,14 +1885,15 @@ if len(affected) > 0:
         on=["country", "payment_method"], how="left"
     )
     sim_df["sim_rate"] = sim_df["rate"].fillna(sim_df["rate_cm"]).fillna(target_overall)
+    sim_df["sim_approved"] = sim_df["sim_rate"] * sim_df["count"]
 
-    n_aff        = len(sim_df)
-    actual_appr  = int(sim_df["approved"].sum())
+    n_aff        = int(sim_df["count"].sum())
+    actual_appr  = int(sim_df["approved_n"].sum())
     actual_rate  = actual_appr / n_aff * 100
-    sim_appr     = sim_df["sim_rate"].sum()           # expected approvals
+    sim_appr     = sim_df["sim_approved"].sum()       # expected approvals
     sim_rate     = sim_appr / n_aff * 100
     delta_appr   = sim_appr - actual_appr
-    avg_amount   = sim_df["amount"].mean()
+    avg_amount   = sim_df["amount_cents"].sum() / n_aff / 100
     recov_rev    = delta_appr * avg_amount
 
     # KPI cards
@@ -1534,10 +1906,10 @@ if len(affected) > 0:
 
     # Breakdown charts
     def _sim_agg(col):
-        g = sim_df.groupby(col).agg(
-            actual_approved=("approved_int", "sum"),
-            sim_approved=("sim_rate", "sum"),
-            total=("id", "count")
+        g = sim_df.groupby(col, observed=True).agg(
+            actual_approved=("approved_n", "sum"),
+            sim_approved=("sim_approved", "sum"),
+            total=("count", "sum")
         ).reset_index()
         g["actual_rate"] = g["actual_approved"] / g["total"] * 100
         g["sim_rate_pct"] = g["sim_approved"]   / g["total"] * 100
@@ -1579,26 +1951,27 @@ if len(affected) > 0:
 
     # Daily impact chart (if date range > 1 day)
     if sim_days[1] > sim_days[0]:
-        agg_day = sim_df.groupby("day").agg(
-            actual_approved=("approved_int", "sum"),
-            sim_approved=("sim_rate", "sum"),
-            total=("id", "count")
+        agg_day = sim_df.groupby("day_ord").agg(
+            actual_approved=("approved_n", "sum"),
+            sim_approved=("sim_approved", "sum"),
+            total=("count", "sum")
         ).reset_index()
+        agg_day["date"] = agg_day["day_ord"].map(ingest.ordinal_to_date)
         agg_day["actual_rate"]  = agg_day["actual_approved"] / agg_day["total"] * 100
         agg_day["sim_rate_pct"] = agg_day["sim_approved"]    / agg_day["total"] * 100
         fig = go.Figure()
-        fig.add_trace(go.Scatter(x=agg_day["day"], y=agg_day["actual_rate"],
+        fig.add_trace(go.Scatter(x=agg_day["date"], y=agg_day["actual_rate"],
                                  name=f"Actual ({sim_source})", mode="lines+markers",
                                  line=dict(color="#E74C3C")))
-        fig.add_trace(go.Scatter(x=agg_day["day"], y=agg_day["sim_rate_pct"],
+        fig.add_trace(go.Scatter(x=agg_day["date"], y=agg_day["sim_rate_pct"],
                                  name=f"Simulated ({sim_target})", mode="lines+markers",
                                  line=dict(color="#37B679", dash="dash")))
         fig.update_layout(title="Daily Approval Rate: Actual vs Simulated",
-                          xaxis_title="Day of November", yaxis_title="Approval Rate (%)",
+                          xaxis_title="Date", yaxis_title="Approval Rate (%)",
                           yaxis_range=[0, 100])
         _plot(fig, use_container_width=True)
 else:
-    st.info(f"No transactions found for {sim_source} during Nov {sim_days[0]}–{sim_days[1]} with the selected filters.")
+    st.info(f"No transactions found for {sim_source} during {_fmt_span(*sim_days)} with the selected filters.")
 
 st.divider()
 
@@ -1607,25 +1980,22 @@ st.markdown('<div id="cohort"></div>', unsafe_allow_html=True)
 st.subheader("Cohort Comparison")
 st.caption("Compare two custom time windows side by side — using current sidebar filters")
 
+# Defaults split the data span in two halves
+_split_date = ingest.ordinal_to_date(split_ord)
 co1, co2 = st.columns(2)
 with co1:
-    period_a = st.slider("Period A (Nov days)", 1, 30, (1, 15),  key="period_a")
+    period_a = _date_slider("Period A", (data_span[0], _split_date), key="period_a")
 with co2:
-    period_b = st.slider("Period B (Nov days)", 1, 30, (16, 30), key="period_b")
-
-label_a = f"Period A  (Nov {period_a[0]}–{period_a[1]})"
-label_b = f"Period B  (Nov {period_b[0]}–{period_b[1]})"
+    period_b = _date_slider("Period B", (min(_split_date + datetime.timedelta(days=1), data_span[1]),
+                                         data_span[1]), key="period_b")
 
-df_a = overview_df[overview_df["day"].between(period_a[0], period_a[1])].copy()
-df_b = overview_df[overview_df["day"].between(period_b[0], period_b[1])].copy()
+label_a = f"Period A  ({_fmt_span(*period_a)})"
+label_b = f"Period B  ({_fmt_span(*period_b)})"
 
-def _kpis(d):
-    t = len(d)
-    a = int(d["approved"].sum())
-    return {"total": t, "approved": a, "declined": t - a,
-            "rate": a / t * 100 if t else 0, "volume": d["amount"].sum()}
+cells_a = view_cells(days=_ords(period_a))
+cells_b = view_cells(days=_ords(period_b))
 
-ka, kb = _kpis(df_a), _kpis(df_b)
+ka, kb = cube.totals(cells_a), cube.totals(cells_b)
 
 # KPI delta row
 c1, c2, c3, c4, c5 = st.columns(5)
@@ -1636,26 +2006,26 @@ c4.metric("Declined A",       f"{ka['declined']:,}",   delta=f"{ka['declined'] -
 c5.metric("Volume A",         f"${ka['volume']:,.0f}", delta=f"${ka['volume'] - kb['volume']:+,.0f} vs B")
 
 # Helper: aggregate by dimension for both periods
-def _cohort_agg(da, db, col):
-    def _agg(d, lbl):
-        g = d.groupby(col).agg(total=("id","count"), approved_sum=("approved_int","sum")).reset_index()
-        g["approval_rate"] = g["approved_sum"] / g["total"] * 100
+def _cohort_agg(ca, cb, col):
+    def _agg(c, lbl):
+        g = cube.rollup(c, col)
         g["period"] = lbl
         return g
-    return pd.concat([_agg(da, label_a), _agg(db, label_b)])
+    return pd.concat([_agg(ca, label_a), _agg(cb, label_b)])
 
 period_colors = {label_a: "#6C5CE7", label_b: "#F77F00"}
 
-comp_country  = _cohort_agg(df_a, df_b, "country")
-comp_method   = _cohort_agg(df_a, df_b, "payment_method")
-comp_proc     = _cohort_agg(df_a, df_b, "processor")
+comp_country  = _cohort_agg(cells_a, cells_b, "country")
+comp_method   = _cohort_agg(cells_a, cells_b, "payment_method")
+comp_proc     = _cohort_agg(cells_a, cells_b, "processor")
 
-def _dec_counts(d, lbl):
-    g = d[~d["approved"]]["decline_reason"].value_counts().reset_index()
+def _dec_counts(c, lbl):
+    g = cube.declined_counts(c, "decline_reason")
+    g = g.sort_values("count", ascending=False, kind="stable")
     g.columns = ["reason", "count"]
     g["period"] = lbl
     return g
-comp_dec = pd.concat([_dec_counts(df_a, label_a), _dec_counts(df_b, label_b)])
+comp_dec = pd.concat([_dec_counts(cells_a, label_a), _dec_counts(cells_b, label_b)])
 
 # Charts
 ch1, ch2 = st.columns(2)
@@ -1694,23 +2064,14 @@ st.divider()
 st.markdown('<div id="time-trends"></div>', unsafe_allow_html=True)
 st.subheader("Time Trends")
 
-daily = fdf.groupby("date").agg(
-    transactions=("id", "count"),
-    approved_sum=("approved_int", "sum")
-).reset_index()
+daily = cube.rollup(fcells, "day_ord").rename(columns={"total": "transactions"})
+daily["date"] = daily["day_ord"].map(ingest.ordinal_to_date)
 daily["approved_pct"] = daily["approved_sum"] / daily["transactions"] * 100
-daily["declined"] = daily["transactions"] - daily["approved_sum"]
-top_dec_day = (
-    fdf[~fdf["approved"]].groupby("date")["decline_reason"]
-    .agg(lambda x: top_val(x)).reset_index().rename(columns={"decline_reason": "top_decline"})
-)
-daily = daily.merge(top_dec_day, on="date", how="left")
-daily["top_decline"] = daily["top_decline"].fillna("N/A")
+daily["top_decline"] = daily["day_ord"].map(
+    cube.top_values(fcells, "day_ord", "decline_reason", declined_only=True)
+).fillna("N/A")
 
-hourly = fdf.groupby("hour").agg(
-    transactions=("id", "count"),
-    approved_sum=("approved_int", "sum")
-).reset_index()
+hourly = cube.rollup(fcells, "hour").rename(columns={"total": "transactions"})
 hourly["approved_pct"] = hourly["approved_sum"] / hourly["transactions"] * 100
 
 t1, t2 = st.columns(2)
@@ -1801,11 +2162,15 @@ if st.session_state.drill_date:
     drill_date = st.session_state.drill_date
     if isinstance(drill_date, str):
         drill_date = pd.to_datetime(drill_date).date()
-    drill_df = fdf[fdf["date"] == drill_date].sort_values("timestamp").reset_index(drop=True)
-    n_drill = len(drill_df)
-    approved_drill = int(drill_df["approved"].sum())
-    rate_drill = approved_drill / n_drill * 100 if n_drill else 0
-    top_dec_drill = top_val(drill_df[~drill_df["approved"]]["decline_reason"]) if not drill_df[~drill_df["approved"]].empty else "N/A"
+    drill_day = (drill_date.toordinal(),) * 2
+    drill_rows = frows.day_slice(drill_day)
+    drill_cells = cube.slice_cells(fcells, days=drill_day)
+    drill_kpi = cube.totals(drill_cells)
+    n_drill = drill_kpi["total"]
+    approved_drill = drill_kpi["approved"]
+    rate_drill = drill_kpi["rate"]
+    top_dec_drill = cube.top_values(drill_cells, "day_ord", "decline_reason", declined_only=True)
+    top_dec_drill = top_dec_drill.iloc[0] if not top_dec_drill.empty else "N/A"
 
     hdr, btn = st.columns([8, 1])
     with hdr:
@@ -1822,19 +2187,15 @@ if st.session_state.drill_date:
 
     # Mini summary by processor for this day
     if n_drill > 0:
-        proc_summary = drill_df.groupby("processor").agg(
-            total=("id", "count"), approved_sum=("approved_int", "sum")
-        ).reset_index()
-        proc_summary["approval_rate"] = proc_summary["approved_sum"] / proc_summary["total"] * 100
-        s1, s2, s3 = st.columns(len(proc_summary))
-        for col, (_, row) in zip([s1, s2, s3], proc_summary.iterrows()):
+        proc_summary = cube.rollup(drill_cells, "processor")
+        for col, (_, row) in zip(st.columns(len(proc_summary)), proc_summary.iterrows()):
             col.metric(row["processor"], f"{row['approval_rate']:.1f}%", f"{int(row['total'])} txns")
 
     st.dataframe(
-        drill_df[[
+        ingest.expand_frame(drill_rows, [
             "id", "timestamp", "country", "payment_method",
             "processor", "amount", "approved", "decline_reason"
-        ]],
+        ]).reset_index(drop=True),
         use_container_width=True,
         height=380
     )
@@ -1864,34 +2225,26 @@ st.markdown('<div id="geography"></div>', unsafe_allow_html=True)
 st.subheader("Geography & Payment Methods")
 st.caption("Click any bar to drill down — all other charts will filter to your selection.")
 
-# Pre-compute enriched stats on overview_df (so clickable charts always show all options)
-country_stats = overview_df.groupby("country").agg(
-    total=("id", "count"), approved_sum=("approved_int", "sum")
-).reset_index()
-country_stats["approval_rate"] = country_stats["approved_sum"] / country_stats["total"] * 100
-country_stats["declined"] = country_stats["total"] - country_stats["approved_sum"]
+# Pre-compute enriched stats on overview cells (so clickable charts always show all options)
+country_stats = cube.rollup(overview_cells, "country")
 country_stats["top_decline"] = country_stats["country"].map(
-    overview_df[~overview_df["approved"]].groupby("country")["decline_reason"].agg(top_val)
-).fillna("N/A")
+    cube.top_values(overview_cells, "country", "decline_reason", declined_only=True)
+).astype(object).fillna("N/A")
 country_stats["top_method"] = country_stats["country"].map(
-    overview_df.groupby("country")["payment_method"].agg(top_val)
-).fillna("N/A")
+    cube.top_values(overview_cells, "country", "payment_method")
+).astype(object).fillna("N/A")
 # Highlight selected
 country_stats["_selected"] = country_stats["country"].apply(
     lambda c: "Selected" if c == st.session_state.drill_country else "Other"
 )
 
-method_stats = overview_df.groupby("payment_method").agg(
-    total=("id", "count"), approved_sum=("approved_int", "sum")
-).reset_index()
-method_stats["approval_rate"] = method_stats["approved_sum"] / method_stats["total"] * 100
-method_stats["declined"] = method_stats["total"] - method_stats["approved_sum"]
+method_stats = cube.rollup(overview_cells, "payment_method")
 method_stats["top_decline"] = method_stats["payment_method"].map(
-    overview_df[~overview_df["approved"]].groupby("payment_method")["decline_reason"].agg(top_val)
-).fillna("N/A")
+    cube.top_values(overview_cells, "payment_method", "decline_reason", declined_only=True)
+).astype(object).fillna("N/A")
 method_stats["top_country"] = method_stats["payment_method"].map(
-    overview_df.groupby("payment_method")["country"].agg(top_val)
-).fillna("N/A")
+    cube.top_values(overview_cells, "payment_method", "country")
+).astype(object).fillna("N/A")
 method_stats["_selected"] = method_stats["payment_method"].apply(
     lambda m: "Selected" if m == st.session_state.drill_method else "Other"
 )
@@ -1986,12 +2339,11 @@ with g2:
         fig_m.update_layout(title="Payment Methods Breakdown")
         _plot(fig_m, use_container_width=True)
 
-# Country × Method heatmap (uses fdf for detail view)
-if not fdf.empty:
-    pivot = fdf.pivot_table(
-        index="country", columns="payment_method",
-        values="approved_int", aggfunc="mean"
-    ) * 100
+# Country × Method heatmap (uses fcells for detail view)
+if not fcells.empty:
+    pivot = cube.rollup(fcells, ["country", "payment_method"]).pivot(
+        index="country", columns="payment_method", values="approval_rate"
+    ).sort_index(axis=1)
     fig_heat = px.imshow(pivot, title="Approval Rate Heatmap: Country × Payment Method (%)",
                          color_continuous_scale="RdYlGn", zmin=0, zmax=100,
                          labels=dict(color="Approval %"), text_auto=".0f")
@@ -2004,17 +2356,13 @@ st.markdown('<div id="processors"></div>', unsafe_allow_html=True)
 st.subheader("Processor Performance")
 st.caption("Click any bar to drill down.")
 
-proc_stats = overview_df.groupby("processor").agg(
-    total=("id", "count"), approved_sum=("approved_int", "sum")
-).reset_index()
-proc_stats["approval_rate"] = proc_stats["approved_sum"] / proc_stats["total"] * 100
-proc_stats["declined"] = proc_stats["total"] - proc_stats["approved_sum"]
+proc_stats = cube.rollup(overview_cells, "processor")
 proc_stats["top_decline"] = proc_stats["processor"].map(
-    overview_df[~overview_df["approved"]].groupby("processor")["decline_reason"].agg(top_val)
-).fillna("N/A")
+    cube.top_values(overview_cells, "processor", "decline_reason", declined_only=True)
+).astype(object).fillna("N/A")
 proc_stats["top_country"] = proc_stats["processor"].map(
-    overview_df.groupby("processor")["country"].agg(top_val)
-).fillna("N/A")
+    cube.top_values(overview_cells, "processor", "country")
+).astype(object).fillna("N/A")
 proc_stats["_selected"] = proc_stats["processor"].apply(
     lambda p: "Selected" if p == st.session_state.drill_processor else "Other"
 )
@@ -2053,10 +2401,7 @@ with p1:
         pass
 
 with p2:
-    proc_country = fdf.groupby(["country", "processor"]).agg(
-        total=("id", "count"), approved_sum=("approved_int", "sum")
-    ).reset_index()
-    proc_country["approval_rate"] = proc_country["approved_sum"] / proc_country["total"] * 100
+    proc_country = cube.rollup(fcells, ["country", "processor"])
     fig_pc = px.bar(proc_country, x="country", y="approval_rate", color="processor",
                     barmode="group", title="Approval Rate by Processor × Country (%)",
                     hover_data={"total": True, "approval_rate": ":.1f"})
@@ -2069,14 +2414,10 @@ st.divider()
 st.markdown('<div id="amounts"></div>', unsafe_allow_html=True)
 st.subheader("Transaction Amount Analysis")
 
-amount_stats = fdf.groupby("amount_bin", observed=True).agg(
-    total=("id", "count"), approved_sum=("approved_int", "sum")
-).reset_index()
-amount_stats["approval_rate"] = amount_stats["approved_sum"] / amount_stats["total"] * 100
-amount_stats["declined"] = amount_stats["total"] - amount_stats["approved_sum"]
+amount_stats = cube.rollup(fcells, "amount_bin")
 amount_stats["top_decline"] = amount_stats["amount_bin"].map(
-    fdf[~fdf["approved"]].groupby("amount_bin", observed=True)["decline_reason"].agg(top_val)
-).fillna("N/A")
+    cube.top_values(fcells, "amount_bin", "decline_reason", declined_only=True)
+).astype(object).fillna("N/A")
 
 a1, a2 = st.columns(2)
 with a1:
@@ -2124,12 +2465,13 @@ st.divider()
 # ── Section 5: Decline Analysis ───────────────────────────────────────────────
 st.markdown('<div id="declines"></div>', unsafe_allow_html=True)
 st.subheader("Decline Analysis")
-declined_df = fdf[~fdf["approved"]].copy()
+declined_cells = fcells[~fcells["approved"]]
 
 d1, d2 = st.columns(2)
 with d1:
     dec_type = st.radio("Decline chart", ["Bar", "Pie"], horizontal=True, key="dec_type")
-    dec = declined_df["decline_reason"].value_counts().reset_index()
+    dec = cube.declined_counts(declined_cells, "decline_reason")
+    dec = dec.sort_values("count", ascending=False, kind="stable")
     dec.columns = ["reason", "count"]
     dec["pct"] = dec["count"] / dec["count"].sum() * 100
     if dec_type == "Bar":
@@ -2154,15 +2496,16 @@ with d1:
     _plot(fig_dr, use_container_width=True)
 
 with d2:
-    if not declined_df.empty:
-        dec_method = declined_df.groupby(["payment_method", "decline_reason"])["id"].count().reset_index(name="count")
+    if not declined_cells.empty:
+        dec_method = cube.declined_counts(declined_cells, ["payment_method", "decline_reason"])
         fig_dm = px.bar(dec_method, x="payment_method", y="count", color="decline_reason",
                         barmode="stack", title="Decline Reasons by Payment Method")
         fig_dm.update_layout(xaxis_title="", yaxis_title="Declined Transactions")
         _plot(fig_dm, use_container_width=True)
 
-if not declined_df.empty:
-    dec_time = declined_df.groupby(["date", "decline_reason"])["id"].count().reset_index(name="count")
+if not declined_cells.empty:
+    dec_time = cube.declined_counts(declined_cells, ["day_ord", "decline_reason"])
+    dec_time["date"] = dec_time["day_ord"].map(ingest.ordinal_to_date)
     fig_dt = px.bar(dec_time, x="date", y="count", color="decline_reason",
                     barmode="stack", title="Decline Reasons Over Time")
     fig_dt.update_layout(xaxis_title="", yaxis_title="Declined Transactions")
@@ -2176,25 +2519,31 @@ st.subheader("Anomaly Deep-Dives")
 
 an1, an2 = st.columns(2)
 with an1:
-    pb_daily = fdf[fdf["processor"] == "Processor B"].groupby("day").agg(
-        total=("id", "count"), approved_sum=("approved_int", "sum")).reset_index()
-    pb_daily["approval_rate"] = pb_daily["approved_sum"] / pb_daily["total"] * 100
-    fig_pb = px.bar(pb_daily, x="day", y="approval_rate",
+    pb_daily = cube.rollup(cube.slice_cells(fcells, processor=["Processor B"]), "day_ord")
+    pb_daily["date"] = pb_daily["day_ord"].map(ingest.ordinal_to_date)
+    fig_pb = px.bar(pb_daily, x="date", y="approval_rate",
                     title="Processor B — Daily Approval Rate (%)",
                     color_discrete_sequence=["#F77F00"])
-    fig_pb.add_vline(x=18, line_dash="dash", line_color="red", annotation_text="Nov 18 anomaly")
+    if not pb_daily.empty:
+        # Mark the worst day (the Nov 18 outage in the bundled data)
+        worst = pb_daily.loc[pb_daily["approval_rate"].idxmin(), "date"]
+        fig_pb.add_vline(x=worst, line_dash="dash", line_color="red")
+        fig_pb.add_annotation(x=worst, y=1, yref="paper", showarrow=False,
+                              text=f"{worst:%b} {worst.day} anomaly")
     fig_pb.update_layout(yaxis_range=[0, 100])
     _plot(fig_pb, use_container_width=True)
 
 with an2:
-    eu_cards = fdf[
-        fdf["country"].isin(["Spain", "Germany"]) &
-        fdf["payment_method"].isin(["card_visa", "card_mastercard"]) &
-        ~fdf["approved"]
-    ].copy()
+    eu_cards = cube.slice_cells(
+        declined_cells, country=["Spain", "Germany"], payment_method=["card_visa", "card_mastercard"]
+    ).copy()
     if not eu_cards.empty:
-        eu_cards["period"] = eu_cards["day"].apply(lambda d: "Nov 1–15" if d <= 15 else "Nov 16–30")
-        tds = eu_cards.groupby(["period", "decline_reason"])["id"].count().reset_index(name="count")
+        eu_cards["period"] = np.where(
+            eu_cards["day_ord"] <= split_ord,
+            _fmt_span(data_span[0], _split_date),
+            _fmt_span(ingest.ordinal_to_date(split_ord + 1), data_span[1]),
+        )
+        tds = cube.declined_counts(eu_cards, ["period", "decline_reason"])
         fig_tds = px.bar(tds, x="period", y="count", color="decline_reason", barmode="stack",
                          title="Spain + Germany Card Declines — 3DS Spike")
         _plot(fig_tds, use_container_width=True)
@@ -2205,19 +2554,26 @@ st.divider()
 st.markdown('<div id="transactions"></div>', unsafe_allow_html=True)
 st.subheader("Recent Transactions")
 st.dataframe(
-    fdf.sort_values("timestamp", ascending=False).head(100)[[
+    ingest.expand_frame(frows.latest(100), [
         "id", "timestamp", "country", "payment_method", "processor",
         "amount", "amount_bin", "approved", "decline_reason"
-    ]].reset_index(drop=True),
+    ]).reset_index(drop=True),
     use_container_width=True
 )
 
-csv = fdf.to_csv(index=False).encode("utf-8")
-st.download_button(
-    label="Export Filtered Data as CSV",
-    data=csv,
-    file_name="luna_filtered_payments.csv",
-    mime="text/csv"
+# Serialized in chunks on a background thread when the button is clicked, never on a rerun
+fmt_col, btn_col = st.columns([1, 3])
+export_fmt = fmt_col.selectbox(
+    "Export format", export.available_formats(), key="export_fmt",
+    format_func=lambda f: export.FORMATS[f][0], label_visibility="collapsed",
+)
+export_label, export_ext, export_mime = export.FORMATS[export_fmt]
+btn_col.download_button(
+    label=f"Export Filtered Data as {export_label}",
+    data=export_data(view_signature, frows, export_fmt),
+    file_name=f"luna_filtered_payments.{export_ext}",
+    mime=export_mime,
+    on_click="ignore",
 )
 
 st.markdown("---")
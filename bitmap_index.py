@@ -0,0 +1,125 @@
+"""Per-value bitmap indexes over the payments frame.
+
+For every indexed dimension and every value in it, the index keeps one packed
+bit array with bit ``i`` set when row ``i`` holds that value. The bits are
+stored as uint64 words, one bit per row. A filter ORs the bitmaps of the
+selected values within a dimension and ANDs the dimensions together. Each
+step touches n/64 words instead of n bools or n object comparisons. The
+result converts to a selection vector (sorted row positions) without
+gathering any other column. A frame that only changed after a known row (new
+rows appended, or a few late ones merged near the end) is indexed with
+``extended``, which copies the bitmap words before that row and indexes the
+rest.
+"""
+import numpy as np
+
+INDEXED_DIMENSIONS = [
+    "country", "processor", "payment_method",
+    "amount_bin", "decline_reason", "approved",
+]
+
+
+def _pack(mask, n_words):
+    bits = np.packbits(mask, bitorder="little")
+    words = np.zeros(n_words * 8, dtype=np.uint8)
+    words[:len(bits)] = bits
+    return words.view(np.uint64)
+
+
+def _dimension_codes(s):
+    """(codes, values) with code -1 for missing values."""
+    if hasattr(s, "cat"):
+        return s.cat.codes.to_numpy(), list(s.cat.categories)
+    values = np.unique(s.to_numpy())
+    return np.searchsorted(values, s.to_numpy()), values.tolist()
+
+
+class BitmapIndex:
+    def __init__(self, df, dimensions=INDEXED_DIMENSIONS):
+        self.n_rows = len(df)
+        self.n_words = (self.n_rows + 63) // 64
+        self.bitmaps = {dim: self._index_rows(df[dim], 0) for dim in dimensions}
+
+    def _index_rows(self, s, first_word):
+        """Per-value bitmap words ``first_word`` onward, from the rows they cover in ``s``."""
+        codes, values = _dimension_codes(s.iloc[first_word * 64:])
+        # Group row positions by code once instead of one scan per value
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(values) + 1))
+        per_value = {}
+        for i, value in enumerate(values):
+            mask = np.zeros(len(codes), dtype=bool)
+            mask[order[bounds[i]:bounds[i + 1]]] = True
+            per_value[value] = _pack(mask, self.n_words - first_word)
+        return per_value
+
+    def extended(self, df, start):
+        """Index of ``df``, whose first ``start`` rows are the ones this index was built on.
+
+        Only the rows from ``start`` on (rounded down to a word) are read;
+        this index is left as it is for readers of the older frame.
+        """
+        new = BitmapIndex.__new__(BitmapIndex)
+        new.n_rows = len(df)
+        new.n_words = (new.n_rows + 63) // 64
+        first = min(start, self.n_rows) // 64
+        new.bitmaps = {}
+        for dim, old in self.bitmaps.items():
+            tail = new._index_rows(df[dim], first)
+            per_value = {}
+            for value in [*old, *(v for v in tail if v not in old)]:
+                bm = new.empty()
+                if value in old:
+                    bm[:first] = old[value][:first]
+                if value in tail:
+                    bm[first:] = tail[value]
+                per_value[value] = bm
+            new.bitmaps[dim] = per_value
+        return new
+
+    def empty(self):
+        return np.zeros(self.n_words, dtype=np.uint64)
+
+    def full(self):
+        bm = np.full(self.n_words, np.iinfo(np.uint64).max, dtype=np.uint64)
+        tail = self.n_rows % 64
+        if tail:
+            bm[-1] = np.uint64((1 << tail) - 1)
+        return bm
+
+    def span(self, lo, hi):
+        """Bitmap of the contiguous rows ``[lo, hi)``, e.g. a date range of a time-sorted frame."""
+        bm = self.empty()
+        if lo >= hi:
+            return bm
+        first, last = lo // 64, (hi - 1) // 64
+        bm[first:last + 1] = np.iinfo(np.uint64).max
+        bm[first] &= np.uint64((1 << 64) - (1 << (lo % 64)))
+        bm[last] &= np.uint64((1 << ((hi - 1) % 64 + 1)) - 1)
+        return bm
+
+    def any_of(self, dim, values):
+        """OR of the bitmaps for ``values`` in ``dim`` (unknown values match nothing)."""
+        per_value = self.bitmaps[dim]
+        out = self.empty()
+        for v in values:
+            bm = per_value.get(v)
+            if bm is not None:
+                np.bitwise_or(out, bm, out=out)
+        return out
+
+    def select(self, **members):
+        """AND across dimensions of ``any_of(dim, values)``; None skips a dimension."""
+        out = self.full()
+        for dim, values in members.items():
+            if values is not None:
+                np.bitwise_and(out, self.any_of(dim, values), out=out)
+        return out
+
+    def count(self, bitmap):
+        return int(np.unpackbits(bitmap.view(np.uint8)).sum())
+
+    def to_selection(self, bitmap):
+        """Sorted row positions of the set bits."""
+        bits = np.unpackbits(bitmap.view(np.uint8), count=self.n_rows, bitorder="little")
+        return np.flatnonzero(bits)
@@ -0,0 +1,169 @@
+"""Columnar on-disk snapshot of the payments frame.
+
+The first load parses the JSON source and writes every column of the finished
+frame (raw and derived) as a NumPy file next to a small ``meta.json``. Later
+loads read those files back directly instead of re-parsing and re-deriving.
+A snapshot is only reused while the source file still has the same size and
+mtime, or, if only the mtime moved, the same SHA-256 content hash.
+"""
+import datetime
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 1
+_HASH_CHUNK = 1 << 20
+
+
+def cache_dir_for(source):
+    """Default snapshot directory: ``.cache/<stem>/`` next to the source file."""
+    source = Path(source)
+    return source.parent / ".cache" / source.stem
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def source_fingerprint(path, with_hash=True):
+    st_ = os.stat(path)
+    fp = {"size": st_.st_size, "mtime_ns": st_.st_mtime_ns}
+    if with_hash:
+        fp["sha256"] = file_sha256(path)
+    return fp
+
+
+# ── Column encoding ───────────────────────────────────────────────────────────
+def _codes_dtype(n_categories):
+    if n_categories < 2 ** 7:
+        return np.int8
+    if n_categories < 2 ** 15:
+        return np.int16
+    return np.int32
+
+
+def _is_date_column(s):
+    first = s.dropna().head(1)
+    return (not first.empty and isinstance(first.iloc[0], datetime.date)
+            and not isinstance(first.iloc[0], datetime.datetime))
+
+
+def _encode_column(s):
+    """Return (spec, array) for one column; spec is JSON-serialisable."""
+    spec = {"name": s.name, "dtype": str(s.dtype)}
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        spec.update(kind="category", ordered=bool(s.cat.ordered),
+                    categories=s.cat.categories.tolist())
+        return spec, s.cat.codes.to_numpy().astype(_codes_dtype(len(s.cat.categories)))
+    if s.dtype == object and _is_date_column(s):
+        spec["kind"] = "date"
+        return spec, pd.to_datetime(s).to_numpy().astype("datetime64[D]")
+    if s.dtype == object or pd.api.types.is_string_dtype(s.dtype):
+        codes, uniques = pd.factorize(s, use_na_sentinel=True)
+        if len(uniques) > len(s) // 2:
+            # Near-unique strings (ids): fixed-width unicode beats a dictionary
+            spec["kind"] = "str"
+            return spec, s.to_numpy(dtype=str, na_value="")
+        spec.update(kind="dict", categories=[str(u) for u in uniques])
+        return spec, codes.astype(_codes_dtype(len(uniques)))
+    spec["kind"] = "plain"
+    return spec, s.to_numpy()
+
+
+def _decode_column(spec, arr):
+    kind = spec["kind"]
+    if kind == "category":
+        dtype = pd.CategoricalDtype(spec["categories"], ordered=spec["ordered"])
+        return pd.Categorical.from_codes(arr, dtype=dtype)
+    if kind == "date":
+        return pd.Series(arr.astype("datetime64[ns]")).dt.date.to_numpy()
+    if kind == "dict":
+        values = np.asarray(spec["categories"] + [None], dtype=object)
+        return pd.array(values.take(arr), dtype=spec["dtype"])
+    if kind == "str":
+        return pd.array(arr.astype(object), dtype=spec["dtype"])
+    return arr
+
+
+# ── Read / write ──────────────────────────────────────────────────────────────
+def _read_meta(cache_dir):
+    try:
+        with open(Path(cache_dir) / "meta.json") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("format") == FORMAT_VERSION else None
+
+
+def _source_matches(meta, source, cache_dir):
+    cached = meta["source"]
+    now = source_fingerprint(source, with_hash=False)
+    if now["size"] != cached["size"]:
+        return False
+    if now["mtime_ns"] == cached["mtime_ns"]:
+        return True
+    # Touched but possibly unchanged (e.g. regenerated with the same seed)
+    if file_sha256(source) != cached["sha256"]:
+        return False
+    meta["source"]["mtime_ns"] = now["mtime_ns"]
+    try:
+        with open(Path(cache_dir) / "meta.json", "w") as f:
+            json.dump(meta, f)
+    except OSError:
+        pass
+    return True
+
+
+def load_snapshot(source, cache_dir=None, schema=""):
+    """Return the cached frame for ``source``, or None if missing or stale."""
+    cache_dir = Path(cache_dir or cache_dir_for(source))
+    meta = _read_meta(cache_dir)
+    if meta is None or meta.get("schema") != schema:
+        return None
+    try:
+        if not _source_matches(meta, source, cache_dir):
+            return None
+        cols = {}
+        for i, spec in enumerate(meta["columns"]):
+            arr = np.load(cache_dir / f"{i}.npy", allow_pickle=False)
+            cols[spec["name"]] = _decode_column(spec, arr)
+    except (OSError, ValueError, KeyError):
+        return None
+    return pd.DataFrame(cols)
+
+
+def save_snapshot(df, source, cache_dir=None, schema="", fingerprint=None):
+    """Write ``df`` as a snapshot of ``source``. Failures are non-fatal."""
+    cache_dir = Path(cache_dir or cache_dir_for(source))
+    tmp_dir = cache_dir.with_name(cache_dir.name + f".tmp{os.getpid()}")
+    try:
+        meta = {
+            "format": FORMAT_VERSION,
+            "schema": schema,
+            "source": fingerprint or source_fingerprint(source),
+            "rows": len(df),
+            "columns": [],
+        }
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+        for i, name in enumerate(df.columns):
+            spec, arr = _encode_column(df[name])
+            np.save(tmp_dir / f"{i}.npy", arr, allow_pickle=False)
+            meta["columns"].append(spec)
+        with open(tmp_dir / "meta.json", "w") as f:
+            json.dump(meta, f)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        os.replace(tmp_dir, cache_dir)
+        return True
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return False
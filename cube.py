@@ -0,0 +1,120 @@
+"""Pre-aggregated OLAP cube of the payments frame.
+
+Each cell is one combination of (date, hour, country, processor,
+payment_method, amount_bin, decline_reason, approved). It stores the
+transaction count, the approved count and the amount sum in cents. Sidebar
+filters become masks over cells, and charts become group-bys over cells, so
+a rerun costs O(cells) instead of O(transactions). Cells are kept in
+``day_ord`` order, so a date range is cut out by binary search before any
+mask is applied.
+"""
+import numpy as np
+import pandas as pd
+
+import group_mode
+import ingest
+
+DIMENSIONS = [
+    "day_ord", "hour", "country", "processor",
+    "payment_method", "amount_bin", "decline_reason", "approved",
+]
+
+
+def _by_day(cells):
+    if cells["day_ord"].is_monotonic_increasing:
+        return cells
+    return cells.sort_values("day_ord", kind="stable", ignore_index=True)
+
+
+def build_cube(df):
+    cells = (
+        df.groupby(DIMENSIONS, observed=True, dropna=False, sort=False)
+        .agg(count=("approved", "size"), amount_cents=("amount_cents", "sum"))
+        .reset_index()
+    )
+    cells["count"] = cells["count"].astype(np.int64)
+    cells["approved_n"] = np.where(cells["approved"], cells["count"], 0)
+    cells["amount_cents"] = cells["amount_cents"].astype(np.int64)
+    return _by_day(cells)
+
+
+def merge_cells(*parts):
+    """Combine cubes built from disjoint row sets (categoricals must share categories)."""
+    parts = [p for p in parts if p is not None and len(p)]
+    if len(parts) <= 1:
+        return parts[0] if parts else None
+    return _by_day(
+        pd.concat(parts, ignore_index=True)
+        .groupby(DIMENSIONS, observed=True, dropna=False, sort=False)
+        [["count", "amount_cents", "approved_n"]].sum()
+        .reset_index()
+    )
+
+
+def slice_cells(cells, days=None, reasons=None, **members):
+    """Cells inside the inclusive ``day_ord`` span ``days`` whose dimensions are in ``members[dim]``.
+
+    ``reasons`` follows the sidebar rule: approved cells always pass,
+    declined cells pass only if their decline reason is listed.
+    """
+    if days is not None:
+        lo, hi = ingest.day_bounds(cells["day_ord"], days)
+        cells = cells.iloc[lo:hi]
+    mask = np.ones(len(cells), dtype=bool)
+    for dim, values in members.items():
+        if values is not None:
+            mask &= cells[dim].isin(values).to_numpy()
+    if reasons is not None:
+        mask &= (cells["approved"] | cells["decline_reason"].isin(reasons)).to_numpy()
+    return cells[mask]
+
+
+def totals(cells):
+    total = int(cells["count"].sum())
+    approved = int(cells["approved_n"].sum())
+    return {
+        "total": total,
+        "approved": approved,
+        "declined": total - approved,
+        "rate": approved / total * 100 if total else 0,
+        "volume": cells["amount_cents"].sum() / 100,
+    }
+
+
+def rollup(cells, by):
+    """Per-group total, approved_sum, declined, approval_rate and volume."""
+    g = cells.groupby(by, observed=True).agg(
+        total=("count", "sum"), approved_sum=("approved_n", "sum"),
+        amount_cents=("amount_cents", "sum"),
+    ).reset_index()
+    g["declined"] = g["total"] - g["approved_sum"]
+    g["approval_rate"] = g["approved_sum"] / g["total"] * 100
+    g["volume"] = g.pop("amount_cents") / 100
+    return g
+
+
+def value_stats(cells, dims=("country", "processor", "payment_method", "decline_reason")):
+    """``{dim: {value: (total, approved, declined)}}`` for every value present in ``cells``.
+
+    The search cards read these per keystroke, so a card is a dict lookup.
+    """
+    stats = {}
+    for dim in dims:
+        g = rollup(cells, dim)
+        stats[dim] = {
+            value: (int(total), int(approved), int(declined))
+            for value, total, approved, declined in zip(g[dim], g["total"], g["approved_sum"], g["declined"])
+        }
+    return stats
+
+
+def declined_counts(cells, by):
+    """Declined transaction counts per ``by`` group (``by`` may include decline_reason)."""
+    dec = cells[~cells["approved"]]
+    return dec.groupby(by, observed=True)["count"].sum().reset_index(name="count")
+
+
+def top_values(cells, by, col, declined_only=False):
+    """Most frequent ``col`` value per ``by`` group; ties go to the first in sort order."""
+    src = cells[~cells["approved"]] if declined_only else cells
+    return group_mode.group_mode(src, by, col, weights="count").set_index(by)["top"].rename(col)
@@ -0,0 +1,89 @@
+"""On-demand export of a filtered view as gzip CSV, Parquet or Arrow IPC.
+
+Nothing is serialized until someone clicks the download button. The view's
+rows (a ``row_view.RowView``, or a ``sqlite_store.RowQuery``) are then
+written ``chunk_rows`` at a time, so only one chunk ever exists in the wide
+legacy layout. Parquet and Arrow
+need ``pyarrow``; without it only gzip CSV is offered.
+"""
+import gzip
+import importlib.util
+import io
+
+import ingest
+
+EXPORT_CHUNK_ROWS = 100_000
+
+# format -> (label, file extension, MIME type)
+FORMATS = {
+    "csv": ("CSV (gzip)", "csv.gz", "application/gzip"),
+    "parquet": ("Parquet", "parquet", "application/vnd.apache.parquet"),
+    "arrow": ("Arrow IPC", "arrow", "application/vnd.apache.arrow.file"),
+}
+
+
+def available_formats():
+    """Formats that can be written here: CSV always, the Arrow-based ones with ``pyarrow``."""
+    if importlib.util.find_spec("pyarrow") is None:
+        return ["csv"]
+    return list(FORMATS)
+
+
+def iter_frames(rows, chunk_rows=EXPORT_CHUNK_ROWS):
+    """The view's rows in the wide layout, ``chunk_rows`` at a time (at least one frame)."""
+    for chunk in rows.chunks(chunk_rows):
+        yield ingest.expand_frame(chunk)
+
+
+def write_csv(rows, fileobj, chunk_rows=EXPORT_CHUNK_ROWS):
+    with gzip.GzipFile(fileobj=fileobj, mode="wb", mtime=0) as gz:
+        text = io.TextIOWrapper(gz, encoding="utf-8", newline="")
+        for i, frame in enumerate(iter_frames(rows, chunk_rows)):
+            frame.to_csv(text, index=False, header=i == 0)
+        text.flush()
+        text.detach()
+
+
+def _arrow_tables(rows, chunk_rows):
+    import pyarrow as pa
+
+    schema = None
+    for frame in iter_frames(rows, chunk_rows):
+        # Categoricals become plain strings so every chunk shares one schema
+        frame = frame.astype({c: object for c in frame.columns if frame[c].dtype == "category"})
+        if schema is None:
+            schema = pa.Schema.from_pandas(frame, preserve_index=False)
+            # A column that is all-missing in the first chunk (e.g. no declines yet)
+            schema = pa.schema([f.with_type(pa.string()) if pa.types.is_null(f.type) else f
+                                for f in schema]).remove_metadata()
+        yield pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+
+
+def write_parquet(rows, fileobj, chunk_rows=EXPORT_CHUNK_ROWS):
+    import pyarrow.parquet as pq
+
+    writer = None
+    for table in _arrow_tables(rows, chunk_rows):
+        writer = writer or pq.ParquetWriter(fileobj, table.schema)
+        writer.write_table(table)
+    writer.close()
+
+
+def write_arrow(rows, fileobj, chunk_rows=EXPORT_CHUNK_ROWS):
+    import pyarrow as pa
+
+    writer = None
+    for table in _arrow_tables(rows, chunk_rows):
+        writer = writer or pa.ipc.new_file(fileobj, table.schema)
+        writer.write_table(table)
+    writer.close()
+
+
+WRITERS = {"csv": write_csv, "parquet": write_parquet, "arrow": write_arrow}
+
+
+def export_bytes(rows, fmt, chunk_rows=EXPORT_CHUNK_ROWS):
+    """The view's rows serialized as ``fmt`` (a ``FORMATS`` key)."""
+    buf = io.BytesIO()
+    WRITERS[fmt](rows, buf, chunk_rows)
+    return buf.getvalue()
@@ -0,0 +1,87 @@
+"""Fuzzy string matching for the search bar, scored in bulk.
+
+The search bar scores what is typed against every dimension value, processor
+and section keyword with ``difflib.SequenceMatcher.ratio``, and keeps those
+above a threshold. A ``FuzzyMatcher`` holds the candidates as a character
+count matrix. One vectorized ``np.minimum`` over that matrix gives every
+candidate's ``quick_ratio``, an upper bound on the exact ratio. Only the few
+candidates whose bound clears the threshold are then scored exactly, so the
+results (and the repo's 0.45 / 0.72 / 0.42 thresholds) are unchanged while
+the per-keystroke work stays small for thousands of candidates. Recent
+queries are answered from an LRU cache.
+"""
+import difflib
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+QUERY_CACHE_SIZE = 256
+
+
+class FuzzyMatcher:
+    """Scores a query against a fixed list of ``candidates`` (already normalized)."""
+
+    def __init__(self, candidates, cache_size=QUERY_CACHE_SIZE):
+        self.candidates = list(candidates)
+        alphabet = sorted({ch for c in self.candidates for ch in c})
+        self._column = {ch: i for i, ch in enumerate(alphabet)}
+        counts = np.zeros((len(self.candidates), len(alphabet)), dtype=np.int32)
+        for row, cand in enumerate(self.candidates):
+            for ch in cand:
+                counts[row, self._column[ch]] += 1
+        self._counts = counts
+        self._lengths = np.array([len(c) for c in self.candidates], dtype=np.int64)
+        # difflib precomputes its index for the second sequence: keep one per candidate
+        self._matchers = [difflib.SequenceMatcher(None, "", c) for c in self.candidates]
+        self._lock = threading.Lock()  # the cached matchers are shared across sessions
+        self.scores = lru_cache(maxsize=cache_size)(self._scores)
+
+    def __len__(self):
+        return len(self.candidates)
+
+    def bounds(self, query):
+        """``quick_ratio`` of ``query`` against every candidate (>= the exact ratio)."""
+        chars, query_counts = np.unique(list(query), return_counts=True)
+        cols = [self._column.get(ch) for ch in chars]
+        shared = [(col, n) for col, n in zip(cols, query_counts) if col is not None]
+        matches = np.zeros(len(self.candidates), dtype=np.int64)
+        if shared:
+            idx, n = map(np.array, zip(*shared))
+            matches = np.minimum(self._counts[:, idx], n).sum(axis=1)
+        total = self._lengths + len(query)
+        return np.divide(2.0 * matches, total, out=np.ones(len(total)), where=total > 0)
+
+    def _scores(self, query, cutoff=0.0, query_first=True):
+        """Exact ``SequenceMatcher`` ratios; 0.0 for candidates whose bound is below ``cutoff``.
+
+        ``query_first`` picks the argument order of the original comparison
+        (``ratio(query, candidate)`` or ``ratio(candidate, query)``), as the
+        ratio is not always symmetric. The returned array is shared: read-only.
+        """
+        out = np.zeros(len(self.candidates))
+        if not self.candidates:
+            return out
+        # Tiny slack so a float rounding in the bound never hides a true match
+        keep = np.flatnonzero(self.bounds(query) >= cutoff - 1e-9)
+        with self._lock:
+            self._exact(query, keep, out, query_first)
+        out.setflags(write=False)
+        return out
+
+    def _exact(self, query, keep, out, query_first):
+        if query_first:
+            for i in keep:
+                self._matchers[i].set_seq1(query)
+                out[i] = self._matchers[i].ratio()
+        else:
+            sm = difflib.SequenceMatcher(None, "", query)
+            for i in keep:
+                sm.set_seq1(self.candidates[i])
+                out[i] = sm.ratio()
+
+
+@lru_cache(maxsize=32)
+def matcher(candidates):
+    """Shared ``FuzzyMatcher`` for a tuple of candidates, built once per distinct tuple."""
+    return FuzzyMatcher(candidates)
@@ -1,13 +1,42 @@
-import random
+"""Generate the mock payments dataset (payments.json).
+
+Columns are drawn as whole NumPy arrays, one block of rows at a time, and the
+two injected anomalies (Processor B outage on Nov 18, EU card 3DS spike after
+Nov 15) are applied as vectorized masks. Each block has its own random stream
+derived from the seed and the block number, so the output depends only on
+``--seed`` and ``--rows``. Blocks are written to disk as soon as they are
+drawn, and the summary is accumulated in the same pass.
+
+``--format`` picks one of four outputs:
+
+- a JSON array (the default, ``indent=2`` as before)
+- NDJSON
+- gzip-compressed NDJSON
+- ``columnar``: ``.npz`` files of typed arrays with int8 dictionary codes
+
+``--partitioned`` writes ``date=YYYY-MM-DD/part-NNNNN.*`` files and a
+``manifest.json`` with the row count and min/max timestamp of each partition.
+``columnar`` output is always partitioned. With ``--workers N`` the blocks are
+sharded across a process pool, and each worker writes its block's partitions
+itself. The output is byte-identical for any worker count.
+
+    python3 generate_payments.py                      # 6,000 rows -> payments.json
+    python3 generate_payments.py --rows 10000000 --format ndjson.gz --out big.ndjson.gz
+    python3 generate_payments.py --rows 100000000 --format columnar --workers 8 --out payments_parts
+"""
+import argparse
+import gzip
 import json
-from datetime import datetime
-import numpy as np
-import pandas as pd
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 
-random.seed(42)
-np.random.seed(42)
+import numpy as np
 
+SEED = 42
 N = 6000
+BLOCK_ROWS = 1_000_000     # rows per random stream; fixed so output is chunk-independent
+WRITE_ROWS = 100_000       # rows formatted per write
 
 COUNTRIES = ['Brazil', 'Mexico', 'Argentina', 'Colombia', 'Spain', 'Germany']
 COUNTRY_WEIGHTS = [0.30, 0.25, 0.15, 0.15, 0.08, 0.07]
@@ -27,89 +56,321 @@ PROCESSOR_WEIGHTS = [0.35, 0.30, 0.35]
 DECLINE_REASONS = ['insufficient_funds', 'fraud_suspicion', 'technical_error', '3ds_failure', 'expired_card']
 DECLINE_WEIGHTS = [0.30, 0.25, 0.20, 0.15, 0.10]
 
+EU_CARD_REASONS = ['insufficient_funds', 'fraud_suspicion', 'technical_error', 'expired_card']
+EU_CARD_WEIGHTS = [0.36, 0.30, 0.22, 0.12]
+
+METHODS = sorted({m for methods, _ in PAYMENT_METHODS_BY_COUNTRY.values() for m in methods})
+CARD_METHODS = [METHODS.index('card_visa'), METHODS.index('card_mastercard')]
+EU_COUNTRIES = [COUNTRIES.index('Spain'), COUNTRIES.index('Germany')]
+PROCESSOR_B = PROCESSORS.index('Processor B')
+NOV_1 = np.datetime64('2023-11-01T00:00:00', 's')
+
+
+# ── Vectorized sampling ───────────────────────────────────────────────────────
+def block_rng(seed, block):
+    """Independent stream for one block of rows."""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(block,)))
+
+
+def sample_block(rng, n):
+    """Draw ``n`` transactions as column arrays (codes index the lists above)."""
+    day = rng.integers(1, 31, n)
+    seconds = rng.integers(0, 24 * 3600, n)
+    country = rng.choice(len(COUNTRIES), n, p=COUNTRY_WEIGHTS)
+
+    method = np.empty(n, dtype=np.int64)
+    method_draw = rng.random(n)
+    for c, name in enumerate(COUNTRIES):
+        names, weights = PAYMENT_METHODS_BY_COUNTRY[name]
+        rows = country == c
+        picks = np.searchsorted(np.cumsum(weights), method_draw[rows], side='right')
+        method[rows] = np.array([METHODS.index(m) for m in names])[np.minimum(picks, len(names) - 1)]
+
+    processor = rng.choice(len(PROCESSORS), n, p=PROCESSOR_WEIGHTS)
+    amount = np.round(np.clip(rng.lognormal(mean=4.79, sigma=0.50, size=n), 10.0, 800.0), 2)
+
+    # Approval: ~82% Nov 1-15, ~70% Nov 16-30, ~10% for Processor B on Nov 18
+    outage = (processor == PROCESSOR_B) & (day == 18)
+    rate = np.where(outage, 0.10, np.where(day <= 15, 0.82, 0.70))
+    approved = rng.random(n) < rate
+
+    # Decline reasons: base mix, then the EU card 3DS spike, then the outage
+    reason = rng.choice(len(DECLINE_REASONS), n, p=DECLINE_WEIGHTS)
+    eu_card = (day > 15) & np.isin(country, EU_COUNTRIES) & np.isin(method, CARD_METHODS)
+    eu_reason = np.array([DECLINE_REASONS.index(r) for r in EU_CARD_REASONS])[
+        rng.choice(len(EU_CARD_REASONS), n, p=EU_CARD_WEIGHTS)]
+    eu_reason = np.where(rng.random(n) < 0.63, DECLINE_REASONS.index('3ds_failure'), eu_reason)
+    reason = np.where(eu_card, eu_reason, reason)
+    reason = np.where(outage & (rng.random(n) < 0.80), DECLINE_REASONS.index('technical_error'), reason)
+    reason = np.where(approved, -1, reason)
+
+    timestamp = NOV_1 + (day - 1) * 86400 + seconds
+    return {
+        'day': day, 'timestamp': timestamp, 'country': country, 'method': method,
+        'processor': processor, 'amount': amount, 'approved': approved, 'reason': reason,
+    }
+
+
+# ── Output formats ────────────────────────────────────────────────────────────
+FORMATS = {'json': '.json', 'ndjson': '.ndjson', 'ndjson.gz': '.ndjson.gz', 'columnar': '.npz'}
+
+
+def _take(block, rows):
+    return {k: v[rows] for k, v in block.items()}
+
+
+def _record_fields(block, ids):
+    return zip(
+        ids.tolist(),
+        np.datetime_as_string(block['timestamp'], unit='s').tolist(),
+        np.array(COUNTRIES, dtype=object)[block['country']].tolist(),
+        np.array(METHODS, dtype=object)[block['method']].tolist(),
+        np.array(PROCESSORS, dtype=object)[block['processor']].tolist(),
+        block['amount'].tolist(), block['approved'].tolist(),
+        np.array(DECLINE_REASONS + [None], dtype=object)[block['reason']].tolist(),
+    )
+
+
+def format_records(block, ids):
+    """JSON array elements for a block, matching ``json.dump(records, f, indent=2)``."""
+    return [
+        '  {\n'
+        f'    "id": "txn_{i:06d}",\n'
+        f'    "timestamp": "{t}",\n'
+        f'    "country": "{c}",\n'
+        f'    "payment_method": "{m}",\n'
+        f'    "processor": "{p}",\n'
+        f'    "amount": {a!r},\n'
+        f'    "approved": {"true" if ok else "false"},\n'
+        f'    "decline_reason": {"null" if r is None else f"{chr(34)}{r}{chr(34)}"}\n'
+        '  }'
+        for i, t, c, m, p, a, ok, r in _record_fields(block, ids)
+    ]
+
+
+def format_ndjson(block, ids):
+    """One compact JSON object per line (``json.dumps(..., separators=(",", ":"))``)."""
+    return ''.join(
+        f'{{"id":"txn_{i:06d}","timestamp":"{t}","country":"{c}","payment_method":"{m}",'
+        f'"processor":"{p}","amount":{a!r},"approved":{"true" if ok else "false"},'
+        f'"decline_reason":{"null" if r is None else f"{chr(34)}{r}{chr(34)}"}}}\n'
+        for i, t, c, m, p, a, ok, r in _record_fields(block, ids)
+    )
+
+
+def columnar_arrays(block, ids):
+    """Typed columns; string fields are int8 codes into ``DICTIONARIES`` (-1 = null)."""
+    return {
+        'id': ids.astype(np.int64),
+        'timestamp': block['timestamp'].astype('datetime64[s]'),
+        'country': block['country'].astype(np.int8),
+        'payment_method': block['method'].astype(np.int8),
+        'processor': block['processor'].astype(np.int8),
+        'amount_cents': np.rint(block['amount'] * 100).astype(np.int32),
+        'approved': block['approved'].astype(bool),
+        'decline_reason': block['reason'].astype(np.int8),
+    }
+
+
+DICTIONARIES = {
+    'country': COUNTRIES, 'payment_method': METHODS,
+    'processor': PROCESSORS, 'decline_reason': DECLINE_REASONS,
+}
+
+
+def _save_npz(path, arrays):
+    """``np.savez`` with fixed zip timestamps, so equal data gives equal bytes."""
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+        for name, arr in arrays.items():
+            info = zipfile.ZipInfo(f'{name}.npy', date_time=(1980, 1, 1, 0, 0, 0))
+            with zf.open(info, 'w', force_zip64=True) as f:
+                np.lib.format.write_array(f, np.ascontiguousarray(arr), allow_pickle=False)
+
+
+def write_rows(path, fmt, block, ids):
+    """Write one block slice in ``fmt``; the output bytes depend only on the data."""
+    if fmt == 'columnar':
+        _save_npz(path, columnar_arrays(block, ids))
+        return
+    if fmt == 'ndjson.gz':
+        with open(path, 'wb') as raw, gzip.GzipFile(filename='', mode='wb', fileobj=raw, mtime=0) as gz:
+            for lo in range(0, len(ids), WRITE_ROWS):
+                part = _take(block, slice(lo, lo + WRITE_ROWS))
+                gz.write(format_ndjson(part, ids[lo:lo + WRITE_ROWS]).encode())
+        return
+    with open(path, 'w') as f:
+        sep = '\n'
+        if fmt == 'json':
+            f.write('[')
+        for lo in range(0, len(ids), WRITE_ROWS):
+            part = _take(block, slice(lo, lo + WRITE_ROWS))
+            if fmt == 'json':
+                f.write(sep + ',\n'.join(format_records(part, ids[lo:lo + WRITE_ROWS])))
+                sep = ',\n'
+            else:
+                f.write(format_ndjson(part, ids[lo:lo + WRITE_ROWS]))
+        if fmt == 'json':
+            f.write('\n]' if len(ids) else ']')
+
+
+class Summary:
+    """Running counts for the printed summary, updated block by block."""
+
+    def __init__(self):
+        self.total = self.approved = 0
+        self.early = [0, 0]
+        self.late = [0, 0]
+        self.pb18 = [0, 0]
+        self.eu_late_dec = [0, 0]
+
+    def add(self, b):
+        early = b['day'] <= 15
+        pb18 = (b['processor'] == PROCESSOR_B) & (b['day'] == 18)
+        eu_late_dec = (~b['approved'] & ~early & np.isin(b['country'], EU_COUNTRIES)
+                       & np.isin(b['method'], CARD_METHODS))
+        self.total += len(b['day'])
+        self.approved += int(b['approved'].sum())
+        for acc, mask in ((self.early, early), (self.late, ~early), (self.pb18, pb18)):
+            acc[0] += int(mask.sum())
+            acc[1] += int(b['approved'][mask].sum())
+        self.eu_late_dec[0] += int(eu_late_dec.sum())
+        self.eu_late_dec[1] += int((b['reason'][eu_late_dec] == DECLINE_REASONS.index('3ds_failure')).sum())
+
+    def merge(self, other):
+        self.total += other.total
+        self.approved += other.approved
+        for mine, theirs in ((self.early, other.early), (self.late, other.late),
+                             (self.pb18, other.pb18), (self.eu_late_dec, other.eu_late_dec)):
+            mine[0] += theirs[0]
+            mine[1] += theirs[1]
+        return self
+
+    def report(self):
+        def pct(acc):
+            return acc[1] / acc[0] * 100 if acc[0] else float('nan')
+
+        print(f"Records generated  : {self.total:,}")
+        print(f"Overall approval   : {pct([self.total, self.approved]):.1f}%")
+        print(f"Nov  1-15 approval : {pct(self.early):.1f}%")
+        print(f"Nov 16-30 approval : {pct(self.late):.1f}%")
+        print()
+        print("Anomalies verified:")
+        print(f"  Processor B / Nov 18  -> {self.pb18[0]:,} txns, {pct(self.pb18):.1f}% approval rate")
+        print(f"  Spain+Germany cards (Nov 16-30 declines) -> {pct(self.eu_late_dec):.1f}% are 3ds_failure")
+
+
+def n_blocks(rows):
+    return -(-rows // BLOCK_ROWS)
+
+
+def draw_block(seed, block, rows):
+    """(data, ids) for ``block``; ids are the 1-based global row numbers."""
+    start = block * BLOCK_ROWS
+    n = min(BLOCK_ROWS, rows - start)
+    return sample_block(block_rng(seed, block), n), np.arange(start + 1, start + n + 1)
+
+
+def generate(rows=N, out='payments.json', seed=SEED, fmt='json'):
+    """Single-file output (JSON array or NDJSON, optionally gzipped)."""
+    summary = Summary()
+    if fmt == 'json':
+        with open(out, 'w') as f:
+            f.write('[')
+            sep = '\n'
+            for block in range(n_blocks(rows)):
+                data, ids = draw_block(seed, block, rows)
+                summary.add(data)
+                for lo in range(0, len(ids), WRITE_ROWS):
+                    part = _take(data, slice(lo, lo + WRITE_ROWS))
+                    f.write(sep + ',\n'.join(format_records(part, ids[lo:lo + WRITE_ROWS])))
+                    sep = ',\n'
+            f.write('\n]' if rows else ']')
+        return summary
+    with open(out, 'wb') as raw:
+        gz = gzip.GzipFile(filename='', mode='wb', fileobj=raw, mtime=0) if fmt == 'ndjson.gz' else None
+        for block in range(n_blocks(rows)):
+            data, ids = draw_block(seed, block, rows)
+            summary.add(data)
+            for lo in range(0, len(ids), WRITE_ROWS):
+                text = format_ndjson(_take(data, slice(lo, lo + WRITE_ROWS)), ids[lo:lo + WRITE_ROWS])
+                (gz or raw).write(text.encode())
+        if gz:
+            gz.close()
+    return summary
+
+
+# ── Date-partitioned output ───────────────────────────────────────────────────
+def write_block_partitions(out_dir, block, seed, rows, fmt):
+    """Draw one block and write it as one file per date; returns (summary, entries)."""
+    data, ids = draw_block(seed, block, rows)
+    summary = Summary()
+    summary.add(data)
+    dates = data['timestamp'].astype('datetime64[D]')
+    order = np.argsort(dates, kind='stable')
+    bounds = np.flatnonzero(np.diff(dates[order].astype(np.int64))) + 1
+    entries = []
+    for rows_idx in np.split(order, bounds):
+        if not len(rows_idx):
+            continue
+        part, part_ids = _take(data, rows_idx), ids[rows_idx]
+        date = str(dates[rows_idx[0]])
+        rel = f'date={date}/part-{block:05d}{FORMATS[fmt]}'
+        os.makedirs(os.path.join(out_dir, f'date={date}'), exist_ok=True)
+        write_rows(os.path.join(out_dir, rel), fmt, part, part_ids)
+        entries.append({
+            'path': rel, 'date': date, 'block': block, 'rows': len(rows_idx),
+            'min_ts': str(part['timestamp'].min()), 'max_ts': str(part['timestamp'].max()),
+        })
+    return summary, entries
+
+
+def generate_partitioned(rows=N, out_dir='payments_parts', seed=SEED, workers=1, fmt='ndjson'):
+    """Date-partitioned files written by the workers, plus ``manifest.json``.
+
+    Each worker draws whole blocks and writes ``date=YYYY-MM-DD/part-NNNNN.*``
+    for every date the block touches, so no two workers share a file.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    summary, entries = Summary(), []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(write_block_partitions, out_dir, b, seed, rows, fmt)
+                   for b in range(n_blocks(rows))]
+        for fut in futures:
+            block_summary, block_entries = fut.result()
+            summary.merge(block_summary)
+            entries += block_entries
+    entries.sort(key=lambda e: (e['date'], e['block']))
+    manifest = {
+        'format': fmt,
+        'rows': rows,
+        'seed': seed,
+        'block_rows': BLOCK_ROWS,
+        'min_ts': min((e['min_ts'] for e in entries), default=None),
+        'max_ts': max((e['max_ts'] for e in entries), default=None),
+        # Every value a string column can take (and the code order for columnar)
+        'dictionaries': DICTIONARIES,
+        'partitions': entries,
+    }
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=1)
+    return summary
+
 
-def sample_amount():
-    v = np.random.lognormal(mean=4.79, sigma=0.50)
-    return round(float(np.clip(v, 10.0, 800.0)), 2)
-
-
-def sample_approved(day, processor):
-    if processor == 'Processor B' and day == 18:
-        return random.random() < 0.10
-    rate = 0.82 if day <= 15 else 0.70
-    return random.random() < rate
-
-
-def sample_decline_reason(day, country, method, processor):
-    if processor == 'Processor B' and day == 18:
-        if random.random() < 0.80:
-            return 'technical_error'
-    if day > 15 and country in ('Spain', 'Germany') and method in ('card_visa', 'card_mastercard'):
-        if random.random() < 0.63:
-            return '3ds_failure'
-        return random.choices(
-            ['insufficient_funds', 'fraud_suspicion', 'technical_error', 'expired_card'],
-            [0.36, 0.30, 0.22, 0.12]
-        )[0]
-    return random.choices(DECLINE_REASONS, DECLINE_WEIGHTS)[0]
-
-
-records = []
-for i in range(N):
-    day = random.randint(1, 30)
-    ts = datetime(
-        2023, 11, day,
-        random.randint(0, 23),
-        random.randint(0, 59),
-        random.randint(0, 59)
-    ).isoformat()
-
-    country = random.choices(COUNTRIES, COUNTRY_WEIGHTS)[0]
-    methods, mweights = PAYMENT_METHODS_BY_COUNTRY[country]
-    method = random.choices(methods, mweights)[0]
-    processor = random.choices(PROCESSORS, PROCESSOR_WEIGHTS)[0]
-    amount = sample_amount()
-    approved = sample_approved(day, processor)
-    decline_reason = None if approved else sample_decline_reason(day, country, method, processor)
-
-    records.append({
-        'id':             f'txn_{i + 1:06d}',
-        'timestamp':      ts,
-        'country':        country,
-        'payment_method': method,
-        'processor':      processor,
-        'amount':         amount,
-        'approved':       approved,
-        'decline_reason': decline_reason,
-    })
-
-with open('payments.json', 'w') as f:
-    json.dump(records, f, indent=2)
-
-df = pd.DataFrame(records)
-df['day'] = df['timestamp'].str[8:10].astype(int)
-
-total       = len(df)
-overall_pct = df['approved'].mean() * 100
-early_pct   = df[df['day'] <= 15]['approved'].mean() * 100
-late_pct    = df[df['day'] > 15]['approved'].mean() * 100
-
-pb18     = df[(df['processor'] == 'Processor B') & (df['day'] == 18)]
-pb18_pct = pb18['approved'].mean() * 100
-
-eu_card_late_dec = df[
-    (~df['approved']) &
-    (df['day'] > 15) &
-    (df['country'].isin(['Spain', 'Germany'])) &
-    (df['payment_method'].isin(['card_visa', 'card_mastercard']))
-]
-tds_pct = (eu_card_late_dec['decline_reason'] == '3ds_failure').mean() * 100
-
-print(f"Records generated  : {total:,}")
-print(f"Overall approval   : {overall_pct:.1f}%")
-print(f"Nov  1-15 approval : {early_pct:.1f}%")
-print(f"Nov 16-30 approval : {late_pct:.1f}%")
-print()
-print("Anomalies verified:")
-print(f"  Processor B / Nov 18  -> {len(pb18):,} txns, {pb18_pct:.1f}% approval rate")
-print(f"  Spain+Germany cards (Nov 16-30 declines) -> {tds_pct:.1f}% are 3ds_failure")
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=N)
+    parser.add_argument('--out', default=None,
+                        help='output file, or partition directory when partitioned')
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--format', dest='fmt', choices=list(FORMATS), default='json')
+    parser.add_argument('--partitioned', action='store_true',
+                        help='write date=YYYY-MM-DD/ partitions plus manifest.json')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='shard blocks across N processes (implies --partitioned)')
+    args = parser.parse_args()
+    if args.partitioned or args.workers or args.fmt == 'columnar':
+        summary = generate_partitioned(args.rows, args.out or 'payments_parts', args.seed,
+                                       args.workers or 1, args.fmt)
+    else:
+        summary = generate(args.rows, args.out or 'payments' + FORMATS[args.fmt], args.seed, args.fmt)
+    summary.report()
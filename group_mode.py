@@ -0,0 +1,96 @@
+"""Vectorized "most frequent value per group".
+
+``group_mode`` replaces ``groupby(...).agg(top_val)``-style callbacks. The
+group and value columns are turned into integer codes (categorical codes
+where available). Every (group, value) pair is counted with one
+``np.bincount`` over ``group * n_values + value``, and the answer is read off
+the resulting 2-D count table with ``argmax``. Ties go to the lowest code,
+which is the first value in sort order.
+"""
+import numpy as np
+import pandas as pd
+
+# Above this many possible groups, only the groups that occur get a table row
+_MAX_DENSE_GROUPS = 1 << 20
+
+
+def codes(s):
+    """(codes, values) with ``values`` in sort order and code -1 for missing entries."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s.cat.codes.to_numpy().astype(np.int64), np.asarray(s.cat.categories, dtype=object)
+    c, values = pd.factorize(s, sort=True)
+    return c.astype(np.int64), np.asarray(values)
+
+
+def _weights(frame, weights):
+    if weights is None:
+        return None
+    w = frame[weights] if isinstance(weights, str) else weights
+    return np.asarray(w)
+
+
+def _counts(index, size, w):
+    table = np.bincount(index, weights=w, minlength=size)
+    if w is not None and w.dtype.kind in "iub":
+        table = np.rint(table).astype(np.int64)
+    return table
+
+
+def group_mode(frame, by, col, weights=None):
+    """Most frequent ``col`` value per ``by`` group, in one pass.
+
+    ``weights`` (a column name or array) counts each row that many times,
+    e.g. ``"count"`` on cube cells. Returns one row per group that has a
+    non-missing ``col``. The row holds the ``by`` columns, ``top`` (the
+    value), ``count`` (how often it occurs) and ``total`` (all non-missing
+    ``col`` entries in the group).
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    v, values = codes(frame[col])
+    w = _weights(frame, weights)
+    keep = v >= 0
+    g = np.zeros(len(frame), dtype=np.int64)
+    levels = []
+    for dim in by:
+        c, dim_values = codes(frame[dim])
+        keep &= c >= 0
+        g = g * len(dim_values) + c
+        levels.append(dim_values)
+    g, v = g[keep], v[keep]
+    if w is not None:
+        w = w[keep]
+
+    n_groups = int(np.prod([len(lv) for lv in levels], dtype=np.int64))
+    present_keys = None
+    if n_groups > _MAX_DENSE_GROUPS:
+        present_keys, g = np.unique(g, return_inverse=True)
+        n_groups = len(present_keys)
+    n_values = max(len(values), 1)
+    table = _counts(g * n_values + v, n_groups * n_values, w).reshape(n_groups, n_values)
+
+    totals = table.sum(axis=1)
+    rows = np.flatnonzero(totals > 0)
+    top = table[rows].argmax(axis=1)
+    out = {}
+    keys = rows if present_keys is None else present_keys[rows]
+    for dim, dim_values in reversed(list(zip(by, levels))):
+        keys, c = np.divmod(keys, len(dim_values))
+        out[dim] = dim_values[c]
+    out = {dim: out[dim] for dim in by}
+    out["top"] = np.asarray(values, dtype=object)[top]
+    out["count"] = table[rows, top]
+    out["total"] = totals[rows]
+    return pd.DataFrame(out)
+
+
+def mode(s, weights=None):
+    """(value, count, total) of the most frequent non-missing entry of ``s``; (None, 0, 0) if none."""
+    c, values = codes(s)
+    keep = c >= 0
+    w = None if weights is None else np.asarray(weights)[keep]
+    counts = _counts(c[keep], len(values), w)
+    total = counts.sum()
+    if not total:
+        return None, 0, 0
+    i = int(counts.argmax())
+    return values[i], counts[i].item(), total.item()
@@ -0,0 +1,388 @@
+"""Streaming, bounded-memory ingestion of payments.json / NDJSON files.
+
+Records are parsed in fixed-size chunks and every chunk is turned straight
+into typed column buffers (float/bool arrays, datetime64 timestamps and
+dictionary codes for the repeated string fields). Nothing holds more than one
+chunk of Python dicts at a time, so peak memory follows ``chunk_rows`` rather
+than the file size. The buffers are concatenated once at the end.
+
+The resulting frame uses a compact layout:
+
+- ``country``, ``payment_method``, ``processor``, ``decline_reason`` and
+  ``amount_bin`` are categoricals (one byte per row)
+- ``id`` is the integer part of ``txn_NNNNNN``
+- ``day_ord`` is the ``datetime.date`` ordinal as int32 (instead of date objects)
+- ``day`` and ``hour`` are int8
+- ``amount_cents`` is int32
+- ``approved`` is the single bool approval column
+
+Rows are kept in timestamp order, so any time window is one contiguous slice
+found by binary search (``day_slice``, ``time_slice``, ``latest``).
+
+``expand_frame`` turns any slice back into the original wide layout for
+display and export.
+"""
+import datetime
+import gzip
+import itertools
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHUNK_ROWS = 50_000
+_READ_SIZE = 1 << 20
+_WHITESPACE = re.compile(r"\s*")
+_SEPARATORS = re.compile(r"[\s,]*")
+
+# Field order matches the generator's records, and therefore today's frame
+FIELDS = [
+    ("id",             "str"),
+    ("timestamp",      "timestamp"),
+    ("country",        "dim"),
+    ("payment_method", "dim"),
+    ("processor",      "dim"),
+    ("amount",         "float"),
+    ("approved",       "bool"),
+    ("decline_reason", "dim"),
+]
+
+AMOUNT_BINS   = [0, 50, 200, 500, float("inf")]
+AMOUNT_LABELS = ["$0–50", "$50–200", "$200–500", "$500+"]
+
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
+# ── Record iterators ──────────────────────────────────────────────────────────
+def open_text(path):
+    if str(path).endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+def iter_json_array(f, read_size=_READ_SIZE):
+    """Yield the elements of a top-level JSON array without loading it whole."""
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+    started = False
+    while True:
+        pos = (_SEPARATORS if started else _WHITESPACE).match(buf, pos).end()
+        if pos >= len(buf):
+            if eof:
+                raise ValueError("unterminated JSON array")
+            buf, pos = f.read(read_size), 0
+            eof = not buf
+            continue
+        if not started:
+            if buf[pos] != "[":
+                raise ValueError("expected a JSON array")
+            started, pos = True, pos + 1
+            continue
+        if buf[pos] == "]":
+            return
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            more = "" if eof else f.read(read_size)
+            if not more:
+                raise
+            buf, pos = buf[pos:] + more, 0
+            continue
+        yield obj
+        pos = end
+
+
+def iter_ndjson(f):
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_records(path):
+    """Yield records from a JSON array or NDJSON file (optionally gzipped)."""
+    with open_text(path) as f:
+        head = f.read(64).lstrip()
+        f.seek(0)
+        if head.startswith("["):
+            yield from iter_json_array(f)
+        else:
+            yield from iter_ndjson(f)
+
+
+def iter_chunks(records, chunk_rows=DEFAULT_CHUNK_ROWS):
+    it = iter(records)
+    while True:
+        chunk = list(itertools.islice(it, chunk_rows))
+        if not chunk:
+            return
+        yield chunk
+
+
+# ── Column buffers ────────────────────────────────────────────────────────────
+def parse_txn_ids(values):
+    """Integer ids for canonical ``txn_NNNNNN`` strings, or None if any differ."""
+    try:
+        nums = [int(v[4:]) for v in values]
+    except (TypeError, ValueError):
+        return None
+    if any(v != f"txn_{n:06d}" for v, n in zip(values, nums)):
+        return None
+    return np.array(nums, dtype=np.int64)
+
+
+def format_txn_ids(ids):
+    """Inverse of ``parse_txn_ids``; passes string ids through unchanged."""
+    ids = np.asarray(ids)
+    if ids.dtype.kind not in "iu" or not len(ids):
+        return ids.astype(object)
+    return np.char.add("txn_", np.char.zfill(ids.astype(str), 6)).astype(object)
+
+
+class ColumnBuffers:
+    """Accumulates record chunks as typed per-column arrays."""
+
+    def __init__(self):
+        self.parts = {name: [] for name, _ in FIELDS}
+        self.vocab = {name: {} for name, kind in FIELDS if kind == "dim"}
+        self.numeric_ids = True
+        self.rows = 0
+
+    def append(self, records):
+        for name, kind in FIELDS:
+            values = [r.get(name) for r in records]
+            if kind == "dim":
+                vocab = self.vocab[name]
+                codes = np.fromiter(
+                    (-1 if v is None else vocab.setdefault(v, len(vocab)) for v in values),
+                    dtype=np.int32, count=len(values))
+                self.parts[name].append(codes)
+            elif kind == "timestamp":
+                self.parts[name].append(pd.to_datetime(values).to_numpy())
+            elif kind == "float":
+                self.parts[name].append(np.array(values, dtype=np.float64))
+            elif kind == "bool":
+                self.parts[name].append(np.array(values, dtype=bool))
+            else:
+                nums = parse_txn_ids(values) if self.numeric_ids else None
+                if nums is None and self.numeric_ids:
+                    # Non-canonical id seen: fall back to plain strings throughout
+                    self.numeric_ids = False
+                    self.parts[name] = [format_txn_ids(p) for p in self.parts[name]]
+                self.parts[name].append(nums if nums is not None else np.array(values, dtype=object))
+        self.rows += len(records)
+
+    def to_frame(self):
+        cols = {}
+        for name, kind in FIELDS:
+            parts = self.parts.pop(name)
+            if not parts:
+                cols[name] = pd.Series([], dtype=object)
+                continue
+            arr = np.concatenate(parts)
+            if kind == "dim":
+                categories = list(self.vocab[name])
+                arr = pd.Categorical.from_codes(arr, categories=categories)
+                arr = arr.reorder_categories(sorted(categories))
+            elif kind == "str" and arr.dtype.kind == "i" and arr.max(initial=0) < 2 ** 31:
+                arr = arr.astype(np.int32)
+            cols[name] = pd.Series(arr, name=name, copy=False)
+        return pd.DataFrame(cols)
+
+
+def add_derived_columns(df):
+    """Add day/hour/bin columns and switch ``amount`` to int32 cents."""
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    days = df["timestamp"].to_numpy().astype("datetime64[D]").astype(np.int64)
+    df["day_ord"] = (days + EPOCH_ORDINAL).astype(np.int32)
+    df["day"] = df["timestamp"].dt.day.astype(np.int8)
+    df["hour"] = df["timestamp"].dt.hour.astype(np.int8)
+    df["amount_bin"] = pd.cut(df["amount"], bins=AMOUNT_BINS, labels=AMOUNT_LABELS)
+    df["amount"] = np.rint(df["amount"].to_numpy() * 100).astype(np.int32)
+    return df.rename(columns={"amount": "amount_cents"})
+
+
+def ordinal_to_date(day_ord):
+    return datetime.date.fromordinal(int(day_ord))
+
+
+def expand_frame(df, columns=None):
+    """Rebuild the original wide layout (string ids, dollar amounts, date objects).
+
+    Only meant for small slices (tables) and export; ``columns`` limits the
+    output to the listed legacy column names.
+    """
+    wide = {
+        "id":             lambda: pd.Series(format_txn_ids(df["id"]), index=df.index, dtype=object),
+        "timestamp":      lambda: df["timestamp"],
+        "country":        lambda: df["country"].astype(object),
+        "payment_method": lambda: df["payment_method"].astype(object),
+        "processor":      lambda: df["processor"].astype(object),
+        "amount":         lambda: df["amount_cents"] / 100,
+        "approved":       lambda: df["approved"],
+        "decline_reason": lambda: df["decline_reason"].astype(object),
+        "date":           lambda: df["day_ord"].map(ordinal_to_date),
+        "day":            lambda: df["day"].astype(np.int64),
+        "hour":           lambda: df["hour"].astype(np.int64),
+        "approved_int":   lambda: df["approved"].astype(np.int64),
+        "amount_bin":     lambda: df["amount_bin"],
+    }
+    columns = columns or list(wide)
+    return pd.DataFrame({c: wide[c]() for c in columns}, index=df.index)
+
+
+def memory_report(df):
+    """Bytes per row for each column, wide layout vs the compact one."""
+    rows = max(len(df), 1)
+    before = expand_frame(df).memory_usage(index=False, deep=True) / rows
+    after = df.memory_usage(index=False, deep=True) / rows
+    after = after.rename({"amount_cents": "amount", "day_ord": "date"})
+    report = pd.DataFrame({"before": before, "after": after}).fillna(0)
+    report.loc["total"] = report.sum()
+    return report.round(1)
+
+
+def read_payments(path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Stream ``path`` (JSON array or NDJSON, ``.gz`` ok) into the payments frame."""
+    buffers = ColumnBuffers()
+    for chunk in iter_chunks(iter_records(path), chunk_rows):
+        buffers.append(chunk)
+    return sort_by_time(add_derived_columns(buffers.to_frame()))
+
+
+# ── Time order ────────────────────────────────────────────────────────────────
+def sort_by_time(df):
+    """Rows in timestamp order; the sort is stable, so ties keep their source order."""
+    if df["timestamp"].is_monotonic_increasing:
+        return df
+    return df.sort_values("timestamp", kind="stable", ignore_index=True)
+
+
+def day_bounds(day_ord, days):
+    """Row bounds ``[lo, hi)`` of the inclusive ordinal span ``days`` in a sorted ``day_ord``.
+
+    Two binary searches, so a time-sorted frame or cube answers any date range
+    in O(log n) and the rows inside it are one contiguous slice.
+    """
+    day_ord = np.asarray(day_ord)
+    return (int(np.searchsorted(day_ord, days[0], side="left")),
+            int(np.searchsorted(day_ord, days[1], side="right")))
+
+
+def day_slice(df, days):
+    """Rows of a time-sorted frame in the inclusive ``day_ord`` span ``days``, as a slice."""
+    lo, hi = day_bounds(df["day_ord"], days)
+    return df.iloc[lo:hi]
+
+
+def time_slice(df, start=None, end=None):
+    """Rows of a time-sorted frame with ``start <= timestamp < end``, as a slice.
+
+    Costs two binary searches plus the rows returned; None leaves a side open.
+    """
+    ts = df["timestamp"].to_numpy()
+    lo = 0 if start is None else int(np.searchsorted(ts, np.datetime64(pd.Timestamp(start)), side="left"))
+    hi = len(ts) if end is None else int(np.searchsorted(ts, np.datetime64(pd.Timestamp(end)), side="left"))
+    return df.iloc[lo:max(lo, hi)]
+
+
+def latest(df, n):
+    """The ``n`` newest rows of a time-sorted frame, newest first."""
+    return df.iloc[::-1].iloc[:n]
+
+
+def align_categories(frame, categories):
+    """Give ``frame``'s categoricals the sorted union of their categories and ``categories``.
+
+    ``categories`` (column -> list) is updated in place. Returns the columns
+    whose union grew, which means frames aligned earlier need the same step again.
+    """
+    grown = []
+    for col in frame.columns:
+        if not isinstance(frame[col].dtype, pd.CategoricalDtype):
+            continue
+        known = categories.get(col, [])
+        new = frame[col].cat.categories
+        if col == "amount_bin":
+            union = AMOUNT_LABELS
+        else:
+            union = sorted(set(known).union(new))
+        if list(new) != union:
+            frame[col] = frame[col].cat.set_categories(union)
+        if union != known:
+            categories[col] = union
+            if known:
+                grown.append(col)
+    return grown
+
+
+# ── Append-only log tailing ───────────────────────────────────────────────────
+class LogTail:
+    """Follows an append-only NDJSON log from a remembered byte offset.
+
+    ``read_new`` parses only the complete lines written since the previous
+    call. A trailing partial line is left for the next call. Malformed lines
+    are counted in ``skipped`` and dropped. If the file shrinks (truncated or
+    rotated), reading restarts from the beginning and the call reports a reset.
+    """
+
+    def __init__(self, path, offset=0, chunk_rows=DEFAULT_CHUNK_ROWS):
+        self.path = path
+        self.offset = offset
+        self.chunk_rows = chunk_rows
+        self.skipped = 0
+
+    def read_new(self):
+        """Return ``(frame, reset)``; ``frame`` is None when no complete line arrived."""
+        reset = False
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return None, False
+        if size < self.offset:
+            self.offset, reset = 0, True
+        if size == self.offset:
+            return None, reset
+        buffers = ColumnBuffers()
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            for chunk in iter_chunks(self._records(f, size), self.chunk_rows):
+                buffers.append(chunk)
+        if not buffers.rows:
+            return None, reset
+        return add_derived_columns(buffers.to_frame()), reset
+
+    def _records(self, f, size):
+        for line in self._complete_lines(f, size):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                self.skipped += 1
+
+    def _complete_lines(self, f, size):
+        """Newline-terminated lines up to ``size``, advancing ``offset`` past each."""
+        pending, pos = b"", self.offset
+        while pos < size:
+            block = f.read(min(_READ_SIZE, size - pos))
+            if not block:
+                break
+            pos += len(block)
+            *lines, pending = (pending + block).split(b"\n")
+            for line in lines:
+                self.offset += len(line) + 1
+                yield line
+
+
+if __name__ == "__main__":
+    import sys
+
+    frame = read_payments(sys.argv[1] if len(sys.argv) > 1 else "payments.json")
+    report = memory_report(frame)
+    print(f"Rows: {len(frame):,}")
+    print("Bytes per row (wide layout -> compact layout):")
+    print(report.to_string())
+    print(f"Reduction: {report.loc['total', 'before'] / report.loc['total', 'after']:.1f}x")
@@ -0,0 +1,149 @@
+"""In-memory payments store fed by tailing an append-only NDJSON log.
+
+``poll`` parses only the lines appended since the last call (see
+``ingest.LogTail``) and holds them as one more pending chunk. The
+pre-aggregated cube is extended with the new rows' cells, and subscribers (the
+live alerts window) get the new rows, so nothing is reloaded from scratch.
+``frame()`` merges the pending rows into the time-sorted frame: only the rows
+at or after the earliest new timestamp are re-sorted, and ``index()`` extends
+the bitmap index from that row on.
+"""
+import threading
+
+import pandas as pd
+
+import bitmap_index
+import cube
+import ingest
+
+
+def _string_ids(chunk):
+    if chunk["id"].dtype.kind not in "iu":
+        return chunk
+    chunk = chunk.copy(deep=False)
+    chunk["id"] = pd.Series(ingest.format_txn_ids(chunk["id"]), index=chunk.index, dtype=object)
+    return chunk
+
+
+class LiveStore:
+    def __init__(self, path, chunk_rows=ingest.DEFAULT_CHUNK_ROWS):
+        self.tail = ingest.LogTail(path, chunk_rows=chunk_rows)
+        self.generation = 0      # bumped whenever the log is truncated or rotated
+        self.rows = 0
+        self.cells = None
+        self._frame = None       # consolidated, time-sorted rows
+        self._pending = []       # chunks polled since the last consolidation
+        self._index = None
+        self._indexed = 0        # leading rows of ``_frame`` that ``_index`` still describes
+        self._categories = {}
+        self._listeners = []
+        self._lock = threading.RLock()
+
+    @property
+    def version(self):
+        return f"live:{self.generation}:{self.rows}"
+
+    def subscribe(self, listener):
+        """Call ``listener(new_rows, reset)`` on every append; replays current rows first."""
+        with self._lock:
+            self._listeners.append(listener)
+            if self.rows:
+                listener(self.frame(), True)
+
+    def _clear(self):
+        self.generation += 1
+        self.rows, self.cells = 0, None
+        self._frame, self._pending, self._categories = None, [], {}
+        self._index, self._indexed = None, 0
+
+    def _held(self):
+        return ([] if self._frame is None else [self._frame]) + self._pending
+
+    def _set_held(self, chunks):
+        if self._frame is not None:
+            self._frame, *chunks = chunks
+        self._pending = chunks
+
+    def _align(self, new):
+        grown = ingest.align_categories(new, self._categories)
+        if not grown:
+            return
+        # A new dimension value appeared: widen the categories of everything held
+        # so far, on shallow copies since readers may still hold the old frames
+        self._set_held([chunk.copy(deep=False) for chunk in self._held()])
+        for chunk in self._held():
+            ingest.align_categories(chunk, self._categories)
+        if self.cells is not None:
+            self.cells = self.cells.copy(deep=False)
+            for col in grown:
+                if col in self.cells:
+                    self.cells[col] = self.cells[col].cat.set_categories(self._categories[col])
+
+    def _ids_compatible(self, new):
+        numeric = [c["id"].dtype.kind in "iu" for c in self._held()[:1] + [new]]
+        if all(numeric) or not any(numeric):
+            return
+        # Mixed numeric and free-form ids: fall back to strings everywhere
+        self._set_held([_string_ids(chunk) for chunk in self._held()])
+        new["id"] = _string_ids(new)["id"]
+
+    def poll(self):
+        """Read newly appended lines; returns the number of rows added."""
+        with self._lock:
+            new, reset = self.tail.read_new()
+            if reset:
+                self._clear()
+            if new is None:
+                if reset:
+                    for listener in self._listeners:
+                        listener(None, True)
+                return 0
+            new = ingest.sort_by_time(new)
+            self._align(new)
+            self._ids_compatible(new)
+            self._pending.append(new)
+            self.rows += len(new)
+            self.cells = cube.merge_cells(self.cells, cube.build_cube(new))
+            for listener in self._listeners:
+                listener(new, reset)
+            return len(new)
+
+    def snapshot(self):
+        """Consistent ``(frame, cells, index, version)`` for one dashboard run."""
+        with self._lock:
+            return self.frame(), self.cells, self.index(), self.version
+
+    def frame(self):
+        """All rows so far as one time-sorted frame (pending chunks are merged in on demand)."""
+        with self._lock:
+            if self._pending:
+                self._merge_pending()
+            return self._frame
+
+    def _merge_pending(self):
+        new = self._pending[0] if len(self._pending) == 1 else (
+            ingest.sort_by_time(pd.concat(self._pending, ignore_index=True)))
+        self._pending = []
+        if self._frame is None:
+            self._frame = new
+            return
+        # Late lines can carry older timestamps: only the held rows after the
+        # earliest new one are re-sorted with the new rows (ties keep held rows first)
+        cut = int(self._frame["timestamp"].searchsorted(new["timestamp"].iloc[0], side="right"))
+        if cut < len(self._frame):
+            new = ingest.sort_by_time(pd.concat([self._frame.iloc[cut:], new], ignore_index=True))
+        self._frame = pd.concat([self._frame.iloc[:cut], new], ignore_index=True)
+        self._indexed = min(self._indexed, cut)
+
+    def index(self):
+        """``BitmapIndex`` of ``frame()``, extended over the rows that changed since the last call."""
+        with self._lock:
+            frame = self.frame()
+            if frame is None:
+                return None
+            if self._index is None:
+                self._index = bitmap_index.BitmapIndex(frame)
+            elif self._indexed < len(frame):
+                self._index = self._index.extended(frame, self._indexed)
+            self._indexed = len(frame)
+            return self._index
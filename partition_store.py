@@ -0,0 +1,135 @@
+"""Date-partitioned payments dataset with partition pruning.
+
+Reads a directory laid out by ``generate_payments.py --partitioned``. It
+holds ``date=YYYY-MM-DD/part-NNNNN.*`` files in any of its formats, plus a
+``manifest.json`` that gives each partition's date, row count and min/max
+timestamp, and the dictionary of every string column. A day range is
+answered from the manifest first, and only the partitions inside it are
+read. Partition frames are kept in a small LRU, so the days nobody is
+looking at stay on disk.
+"""
+import datetime
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import ingest
+
+MANIFEST = "manifest.json"
+_DIMS = ["country", "payment_method", "processor", "decline_reason"]
+
+
+class PartitionStore:
+    def __init__(self, root, max_partitions=128):
+        self.root = root
+        path = os.path.join(root, MANIFEST)
+        with open(path) as f:
+            self.manifest = json.load(f)
+        self.version = f"parts:{os.path.abspath(root)}:{os.stat(path).st_mtime_ns}"
+        self.partitions = sorted(self.manifest["partitions"], key=lambda p: (p["date"], p["block"]))
+        for p in self.partitions:
+            p["_date"] = datetime.date.fromisoformat(p["date"])
+        self.dictionaries = self.manifest.get("dictionaries", {})
+        self.max_partitions = max_partitions
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+
+    def categories(self, dim):
+        return sorted(self.dictionaries.get(dim, []))
+
+    def row_count(self):
+        return sum(p["rows"] for p in self.partitions)
+
+    @property
+    def span(self):
+        """(first, last) ``datetime.date`` held, from the manifest."""
+        if not self.partitions:
+            return None
+        return self.partitions[0]["_date"], self.partitions[-1]["_date"]
+
+    # ── Pruning ──────────────────────────────────────────────────────────────
+    def prune(self, days=None, start=None, end=None):
+        """Partitions dated inside the inclusive ``day_ord`` span ``days`` whose
+        rows overlap [``start``, ``end``] (timestamps); None means unbounded."""
+        keep = []
+        for p in self.partitions:
+            if days is not None and not days[0] <= p["_date"].toordinal() <= days[1]:
+                continue
+            if start is not None and pd.Timestamp(p["max_ts"]) < start:
+                continue
+            if end is not None and pd.Timestamp(p["min_ts"]) > end:
+                continue
+            keep.append(p)
+        return keep
+
+    # ── Reading ──────────────────────────────────────────────────────────────
+    def _read(self, p):
+        path = os.path.join(self.root, p["path"])
+        if path.endswith(".npz"):
+            frame = self._read_columnar(path)
+        else:
+            frame = ingest.read_payments(path)
+        # Same categories in every partition so frames concatenate as categoricals
+        for dim in _DIMS:
+            frame[dim] = frame[dim].cat.set_categories(self.categories(dim))
+        return frame
+
+    def _read_columnar(self, path):
+        with np.load(path, allow_pickle=False) as z:
+            cols = {name: z[name] for name in z.files}
+        ids = cols["id"]
+        frame = pd.DataFrame({
+            "id": ids.astype(np.int32) if ids.max(initial=0) < 2 ** 31 else ids,
+            "timestamp": cols["timestamp"].astype("datetime64[us]"),
+            **{dim: pd.Categorical.from_codes(cols[dim], categories=self.dictionaries[dim])
+               for dim in ["country", "payment_method", "processor"]},
+            "amount": cols["amount_cents"] / 100,
+            "approved": cols["approved"],
+            "decline_reason": pd.Categorical.from_codes(
+                cols["decline_reason"], categories=self.dictionaries["decline_reason"]),
+        })
+        return ingest.add_derived_columns(frame)
+
+    def partition_frame(self, p):
+        with self._lock:
+            frame = self._frames.get(p["path"])
+            if frame is not None:
+                self._frames.move_to_end(p["path"])
+                return frame
+        frame = self._read(p)
+        with self._lock:
+            self._frames[p["path"]] = frame
+            while len(self._frames) > self.max_partitions:
+                self._frames.popitem(last=False)
+        return frame
+
+    def load(self, days=None, start=None, end=None):
+        """Rows of the pruned partitions as one frame, in time order."""
+        frames = [self.partition_frame(p) for p in self.prune(days, start, end)]
+        if not frames:
+            return self._read_empty()
+        # Partitions are in (date, block) order, so equal timestamps stay in id order
+        return ingest.sort_by_time(pd.concat(frames, ignore_index=True))
+
+    def load_recent(self, window):
+        """Partitions that can hold rows within ``window`` of the newest timestamp."""
+        newest = pd.Timestamp(self.manifest["max_ts"]) if self.manifest.get("max_ts") else None
+        if newest is None:
+            return self._read_empty()
+        return self.load(start=newest - pd.Timedelta(window))
+
+    def _read_empty(self):
+        frame = pd.DataFrame({
+            "id": np.array([], dtype=np.int32),
+            "timestamp": np.array([], dtype="datetime64[us]"),
+            **{dim: pd.Categorical([], categories=self.categories(dim))
+               for dim in ["country", "payment_method", "processor"]},
+            "amount": np.array([], dtype=np.float64),
+            "approved": np.array([], dtype=bool),
+            "decline_reason": pd.Categorical([], categories=self.categories("decline_reason")),
+        })
+        return ingest.add_derived_columns(frame)
@@ -0,0 +1,53 @@
+"""The "by <dimension>" clause of a search-bar question.
+
+"approval rate by country" asks for one row per country. "declined by
+processor b" and "processed by processor b" name a single value, so they
+filter instead. A "by <dimension>" phrase only counts as a grouping when it
+is not the start of a known value of that dimension. The grouping clause is
+cut out of the question so its words are not read as filters too.
+
+>>> values = {"processor": ["Processor A", "Processor B"], "country": ["Spain"],
+...           "decline_reason": ["technical_error"]}
+>>> split_group_by("declined by processor b", values)
+(None, 'declined by processor b')
+>>> split_group_by("transactions processed by processor b", values)
+(None, 'transactions processed by processor b')
+>>> split_group_by("approval rate by country for processor b", values)
+('country', 'approval rate for processor b')
+>>> split_group_by("declines by hour in spain", values)
+('hour', 'declines in spain')
+>>> split_group_by("declined by processor b by reason", values)
+('decline_reason', 'declined by processor b')
+>>> split_group_by("approval rate per processor", values)
+('processor', 'approval rate')
+"""
+import re
+
+GROUP_BY = re.compile(r'\b(?:by|per)\s+(decline reasons?|reasons?|payment methods?|methods?|'
+                      r'countr(?:y|ies)|processors?|hours?|days?|dates?|amount (?:bins?|brackets?)|brackets?)\b')
+GROUP_DIMS = [("decline reason", "decline_reason"), ("reason", "decline_reason"),
+              ("payment method", "payment_method"), ("method", "payment_method"),
+              ("countr", "country"), ("processor", "processor"), ("hour", "hour"),
+              ("day", "day_ord"), ("date", "day_ord"), ("amount", "amount_bin"), ("bracket", "amount_bin")]
+
+
+def _names_value(text, values):
+    """Whether ``text`` starts with one of ``values`` (as written, or with spaces for underscores)."""
+    for value in values:
+        for name in {value.lower(), value.lower().replace("_", " ")}:
+            if re.match(re.escape(name) + r'\b', text):
+                return True
+    return False
+
+
+def split_group_by(q, values):
+    """(dimension, ``q`` without the clause) for the first grouping clause; (None, ``q``) if none.
+
+    ``values`` maps a dimension to its known values (e.g. ``cube.value_stats``).
+    """
+    for m in GROUP_BY.finditer(q):
+        dim = next(dim for prefix, dim in GROUP_DIMS if m.group(1).startswith(prefix))
+        if _names_value(q[m.start(1):], values.get(dim, ())):
+            continue
+        return dim, f"{q[:m.start()].rstrip()} {q[m.end():].lstrip()}".strip()
+    return None, q
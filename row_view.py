@@ -0,0 +1,71 @@
+"""Selection-vector views over one shared payments frame.
+
+A ``RowView`` is the base frame plus the positions of the rows that passed
+a filter (None means every row). Filters, date windows and "newest n" only
+narrow the positions. A column is gathered when a computation first reads
+it, once per view, so no step duplicates the whole frame. ``view[col]`` and
+``view.index`` behave like a DataFrame's, which lets ``ingest.expand_frame``
+build tables and exports straight from a view.
+"""
+import numpy as np
+import pandas as pd
+
+import ingest
+
+
+class RowView:
+    """Rows ``rows`` (ascending positions, or None for all) of ``base``."""
+
+    def __init__(self, base, rows=None):
+        self.base = base
+        self.rows = None if rows is None else np.asarray(rows, dtype=np.int64)
+        self._columns = {}
+
+    def __len__(self):
+        return len(self.base) if self.rows is None else len(self.rows)
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    @property
+    def positions(self):
+        return np.arange(len(self.base)) if self.rows is None else self.rows
+
+    @property
+    def index(self):
+        return self.base.index if self.rows is None else self.base.index[self.rows]
+
+    def __getitem__(self, name):
+        """Column ``name`` of the selected rows; gathered on first use, then cached."""
+        col = self._columns.get(name)
+        if col is None:
+            col = self.base[name] if self.rows is None else self.base[name].iloc[self.rows]
+            self._columns[name] = col
+        return col
+
+    def frame(self, columns=None):
+        """The selected rows as a DataFrame of ``columns`` (all of them by default)."""
+        columns = list(self.base.columns) if columns is None else list(columns)
+        return pd.DataFrame({c: self[c] for c in columns}, index=self.index)
+
+    def where(self, mask):
+        """The rows for which ``mask`` (aligned with this view) is true."""
+        return RowView(self.base, self.positions[np.asarray(mask, dtype=bool)])
+
+    def day_slice(self, days):
+        """Rows in the inclusive ``day_ord`` span ``days``: binary searches, as the base is time-sorted."""
+        lo, hi = ingest.day_bounds(self.base["day_ord"], days)
+        if self.rows is None:
+            return RowView(self.base, np.arange(lo, hi))
+        return RowView(self.base, self.rows[np.searchsorted(self.rows, lo):np.searchsorted(self.rows, hi)])
+
+    def latest(self, n):
+        """The ``n`` newest rows, newest first (the result is for display, not further slicing)."""
+        return RowView(self.base, self.positions[::-1][:n])
+
+    def chunks(self, chunk_rows):
+        """Views of at most ``chunk_rows`` consecutive selected rows (at least one)."""
+        positions = self.positions
+        for start in range(0, max(len(positions), 1), chunk_rows):
+            yield RowView(self.base, positions[start:start + chunk_rows])
@@ -0,0 +1,292 @@
+"""Optional SQLite (WAL) storage backend for the payments data.
+
+Rows are kept in one ``payments`` table with the derived columns stored
+alongside them. It has indexes on ``ts``, ``(processor, ts)`` and
+``(country, payment_method)``. Filters are pushed down as SQL ``WHERE``
+clauses. A date range becomes one ``ts`` interval, so it can use the
+timestamp indexes. Cube cells are aggregated in SQL with
+``GROUP BY``. Dimension values are kept in a small ``dim_values`` table, so
+categoricals can be rebuilt without scanning the data. Rows themselves are
+only fetched through a ``RowQuery``: a count, the newest few, one day, or
+chunk by chunk, so the table is never read into one frame.
+"""
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+import cube
+import ingest
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS payments (
+    id              TEXT    NOT NULL,
+    ts              INTEGER NOT NULL,   -- microseconds since the epoch
+    country         TEXT,
+    payment_method  TEXT,
+    processor       TEXT,
+    amount_cents    INTEGER NOT NULL,
+    approved        INTEGER NOT NULL,
+    decline_reason  TEXT,
+    day_ord         INTEGER NOT NULL,
+    day             INTEGER NOT NULL,
+    hour            INTEGER NOT NULL,
+    amount_bin      TEXT
+);
+CREATE INDEX IF NOT EXISTS payments_ts ON payments (ts);
+CREATE INDEX IF NOT EXISTS payments_processor_ts ON payments (processor, ts);
+CREATE INDEX IF NOT EXISTS payments_country_method ON payments (country, payment_method);
+CREATE TABLE IF NOT EXISTS dim_values (
+    dim   TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (dim, value)
+) WITHOUT ROWID;
+"""
+
+COLUMNS = [
+    "id", "ts", "country", "payment_method", "processor", "amount_cents",
+    "approved", "decline_reason", "day_ord", "day", "hour", "amount_bin",
+]
+DIMS = ["country", "payment_method", "processor", "decline_reason"]
+_US_PER_DAY = 86_400 * 10 ** 6
+
+
+def _in_clause(col, values):
+    values = list(values)
+    if not values:
+        return "0", []
+    return f"{col} IN ({', '.join('?' * len(values))})", values
+
+
+class PaymentsDB:
+    """Thread-safe wrapper around one SQLite connection in WAL mode."""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    # ── Writing ──────────────────────────────────────────────────────────────
+    def append_frame(self, frame):
+        """Insert rows of a frame in the ``ingest`` layout."""
+        ts = frame["timestamp"].to_numpy().astype("datetime64[us]").astype(np.int64)
+        rows = zip(
+            ingest.format_txn_ids(frame["id"]).tolist(), ts.tolist(),
+            *(frame[c].astype(object).where(frame[c].notna(), None).tolist() for c in
+              ["country", "payment_method", "processor"]),
+            frame["amount_cents"].astype(np.int64).tolist(),
+            frame["approved"].astype(np.int64).tolist(),
+            frame["decline_reason"].astype(object).where(frame["decline_reason"].notna(), None).tolist(),
+            *(frame[c].astype(np.int64).tolist() for c in ["day_ord", "day", "hour"]),
+            frame["amount_bin"].astype(object).where(frame["amount_bin"].notna(), None).tolist(),
+        )
+        with self._lock, self.conn:
+            self.conn.executemany(
+                f"INSERT INTO payments ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO dim_values VALUES (?, ?)",
+                [(d, v) for d in DIMS for v in frame[d].dropna().unique().tolist()])
+
+    def import_file(self, source, chunk_rows=ingest.DEFAULT_CHUNK_ROWS):
+        """Load a JSON / NDJSON file chunk by chunk (memory follows ``chunk_rows``)."""
+        for chunk in ingest.iter_chunks(ingest.iter_records(source), chunk_rows):
+            buffers = ingest.ColumnBuffers()
+            buffers.append(chunk)
+            self.append_frame(ingest.add_derived_columns(buffers.to_frame()))
+
+    # ── Reading ──────────────────────────────────────────────────────────────
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def row_count(self):
+        return self._query("SELECT COUNT(*) FROM payments")[0][0]
+
+    @property
+    def version(self):
+        # The table is append-only, so the newest rowid identifies its contents
+        return f"sqlite:{self.path}:{self._query('SELECT MAX(rowid) FROM payments')[0][0]}"
+
+    def categories(self, dim):
+        return [v for (v,) in self._query("SELECT value FROM dim_values WHERE dim = ? ORDER BY value", (dim,))]
+
+    def _categorical(self, dim, values):
+        return pd.Categorical(values, categories=self.categories(dim))
+
+    @property
+    def span(self):
+        """(first, last) ``datetime.date`` held, from the ends of the ``ts`` index."""
+        first, last = self._query("SELECT MIN(ts), MAX(ts) FROM payments")[0]
+        if first is None:
+            return None
+        return tuple(ingest.ordinal_to_date(ts // _US_PER_DAY + ingest.EPOCH_ORDINAL) for ts in (first, last))
+
+    def _where(self, days=None, reasons=None, amount=None, **members):
+        clauses, params = [], []
+        if days is not None:
+            # Whole days as one half-open ``ts`` interval
+            clauses.append("ts >= ? AND ts < ?")
+            params += [(int(days[0]) - ingest.EPOCH_ORDINAL) * _US_PER_DAY,
+                       (int(days[1]) + 1 - ingest.EPOCH_ORDINAL) * _US_PER_DAY]
+        if amount is not None:
+            # ("gt" | "lt", cents)
+            op, cents = amount
+            clauses.append(f"amount_cents {'>' if op == 'gt' else '<'} ?")
+            params.append(int(cents))
+        for dim, values in members.items():
+            if values is not None:
+                sql, p = _in_clause(dim, values)
+                clauses.append(sql)
+                params += p
+        if reasons is not None:
+            sql, p = _in_clause("decline_reason", reasons)
+            clauses.append(f"(approved = 1 OR {sql})")
+            params += p
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def select_rows(self, days=None, reasons=None, amount=None, newest=None, **members):
+        """Rows matching the filters as a frame in the ``ingest`` layout, in time order.
+
+        ``days`` is an inclusive ``day_ord`` span and ``amount`` a ("gt" | "lt",
+        cents) threshold. ``members`` maps a dimension to its allowed values;
+        None skips it, as in ``cube.slice_cells``. ``newest=n`` returns only
+        the ``n`` newest rows, newest first.
+        """
+        where, params = self._where(days, reasons, amount, **members)
+        order = "ts, rowid" if newest is None else f"ts DESC, rowid DESC LIMIT {int(newest)}"
+        return self._frame(self._query(
+            f"SELECT {', '.join(COLUMNS)} FROM payments{where} ORDER BY {order}", params))
+
+    def iter_rows(self, chunk_rows, days=None, reasons=None, amount=None, **members):
+        """``select_rows`` in time order, ``chunk_rows`` rows per frame (at least one frame).
+
+        Each chunk resumes after the last (ts, rowid) seen, so every query is
+        one range scan and only one chunk is held at a time.
+        """
+        where, params = self._where(days, reasons, amount, **members)
+        after, after_params = "", []
+        while True:
+            rows = self._query(
+                f"SELECT rowid, {', '.join(COLUMNS)} FROM payments{where}{after} ORDER BY ts, rowid LIMIT ?",
+                params + after_params + [int(chunk_rows)])
+            if rows or not after:
+                yield self._frame([r[1:] for r in rows])
+            if len(rows) < chunk_rows:
+                return
+            last_ts, last_rowid = rows[-1][COLUMNS.index("ts") + 1], rows[-1][0]
+            after = f"{' AND' if where else ' WHERE'} (ts > ? OR (ts = ? AND rowid > ?))"
+            after_params = [last_ts, last_ts, last_rowid]
+
+    def count(self, days=None, reasons=None, amount=None, **members):
+        where, params = self._where(days, reasons, amount, **members)
+        return self._query(f"SELECT COUNT(*) FROM payments{where}", params)[0][0]
+
+    def recent_rows(self, window):
+        """Rows within ``window`` (a Timedelta) of the newest timestamp, in time order."""
+        (newest,) = self._query("SELECT MAX(ts) FROM payments")[0]
+        if newest is None:
+            return self._frame([])
+        since = newest - int(pd.Timedelta(window).value // 1000)
+        return self._frame(self._query(
+            f"SELECT {', '.join(COLUMNS)} FROM payments WHERE ts >= ? ORDER BY ts, rowid", [since]))
+
+    def processor_order(self, days=None, reasons=None, amount=None, **members):
+        """Processors of the matching rows in order of first appearance (lowest rowid)."""
+        where, params = self._where(days, reasons, amount, **members)
+        return [p for (p,) in self._query(
+            f"SELECT processor FROM payments{where} GROUP BY processor ORDER BY MIN(rowid)", params)
+            if p is not None]
+
+    def rows(self, days=None, reasons=None, amount=None, **members):
+        """A ``RowQuery`` for the matching rows; nothing is read until it is used."""
+        return RowQuery(self, days=days, reasons=reasons, amount=amount, **members)
+
+    def _frame(self, rows):
+        cols = dict(zip(COLUMNS, zip(*rows))) if rows else {c: () for c in COLUMNS}
+        ids = list(cols["id"])
+        nums = ingest.parse_txn_ids(ids)
+        frame = pd.DataFrame({
+            "id": nums.astype(np.int32) if nums is not None and nums.max(initial=0) < 2 ** 31
+                  else pd.Series(ids, dtype=object),
+            "timestamp": np.array(cols["ts"], dtype=np.int64).astype("datetime64[us]"),
+            **{d: self._categorical(d, cols[d]) for d in ["country", "payment_method", "processor"]},
+            "amount_cents": np.array(cols["amount_cents"], dtype=np.int32),
+            "approved": np.array(cols["approved"], dtype=bool),
+            "decline_reason": self._categorical("decline_reason", cols["decline_reason"]),
+            "day_ord": np.array(cols["day_ord"], dtype=np.int32),
+            "day": np.array(cols["day"], dtype=np.int8),
+            "hour": np.array(cols["hour"], dtype=np.int8),
+            "amount_bin": pd.Categorical(cols["amount_bin"], categories=ingest.AMOUNT_LABELS, ordered=True),
+        })
+        return frame
+
+    def cube_cells(self, days=None, reasons=None, amount=None, dims=cube.DIMENSIONS, **members):
+        """``cube.build_cube`` of the matching rows, aggregated inside SQLite.
+
+        ``dims`` may list fewer dimensions for a coarser cube (e.g. per-value
+        counts), which is a much smaller result than the full one.
+        """
+        where, params = self._where(days, reasons, amount, **members)
+        dims = list(dims)
+        group = ", ".join(dims)
+        order = " ORDER BY day_ord" if "day_ord" in dims else ""
+        rows = self._query(
+            f"SELECT {group}, COUNT(*), SUM(amount_cents), SUM(approved) "
+            f"FROM payments{where} GROUP BY {group}{order}", params)
+        names = dims + ["count", "amount_cents", "approved_n"]
+        cols = dict(zip(names, zip(*rows))) if rows else {c: () for c in names}
+        columns = {
+            "day_ord": lambda: np.array(cols["day_ord"], dtype=np.int32),
+            "hour": lambda: np.array(cols["hour"], dtype=np.int8),
+            **{d: (lambda d=d: self._categorical(d, cols[d])) for d in DIMS},
+            "amount_bin": lambda: pd.Categorical(cols["amount_bin"], categories=ingest.AMOUNT_LABELS, ordered=True),
+            "approved": lambda: np.array(cols["approved"], dtype=bool),
+        }
+        return pd.DataFrame({
+            **{d: columns[d]() for d in dims},
+            "count": np.array(cols["count"], dtype=np.int64),
+            "amount_cents": np.array(cols["amount_cents"], dtype=np.int64),
+            "approved_n": np.array(cols["approved_n"], dtype=np.int64),
+        })
+
+
+class RowQuery:
+    """The rows matching one set of ``PaymentsDB`` filters, read lazily.
+
+    The SQLite counterpart of ``row_view.RowView`` for the consumers that
+    need actual rows: the day drill-down, the newest-rows tables and the
+    export. Each one runs its own small or chunked query.
+    """
+
+    def __init__(self, db, **filters):
+        self.db = db
+        self.filters = filters
+        self._len = None
+
+    def __len__(self):
+        if self._len is None:
+            self._len = self.db.count(**self.filters)
+        return self._len
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    def day_slice(self, days):
+        """Rows in the inclusive ``day_ord`` span ``days`` (within the query's own days)."""
+        own = self.filters.get("days")
+        if own is not None:
+            days = (max(days[0], own[0]), min(days[1], own[1]))
+        return self.db.select_rows(**{**self.filters, "days": days})
+
+    def latest(self, n):
+        """The ``n`` newest rows, newest first."""
+        return self.db.select_rows(newest=n, **self.filters)
+
+    def chunks(self, chunk_rows):
+        """Frames of at most ``chunk_rows`` rows in time order (at least one)."""
+        return self.db.iter_rows(chunk_rows, **self.filters)
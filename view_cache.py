@@ -0,0 +1,145 @@
+"""Bounded result cache for whole dashboard views.
+
+Every rerun derives the same things from the sidebar state: the filtered row
+selection, the sliced cube cells, the insights and the recommendations. This
+cache stores those results under a canonical filter signature, so going back
+to a view that any session has already seen is a dictionary lookup. Entries
+are evicted least-recently-used once ``max_entries`` is reached or their
+approximate size exceeds ``max_bytes``, and after ``ttl`` seconds. Cached
+values are shared, so callers must treat them as read-only.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def _canonical(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (tuple, range)):
+        return tuple(_canonical(v) for v in value)
+    if isinstance(value, (list, set, frozenset)):
+        # Multiselect order does not change the result
+        return tuple(sorted((_canonical(v) for v in value), key=repr))
+    return str(value)
+
+
+def filter_signature(dataset_version, date_range, drill=None, **filters):
+    """Hashable key for one view: dataset version, date range, filters, drill-downs."""
+    return (
+        dataset_version,
+        _canonical(tuple(date_range)),
+        tuple((k, _canonical(v)) for k, v in sorted(filters.items())),
+        tuple((k, _canonical(v)) for k, v in sorted((drill or {}).items())),
+    )
+
+
+def approx_size(value):
+    """Approximate bytes held by ``value``: arrays, frames and the containers around them.
+
+    Other objects count only their own header, so a ``RowQuery`` does not
+    charge its entry for the database it reads from.
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(approx_size(k) + approx_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(approx_size(v) for v in value)
+    return size
+
+
+class ViewCache:
+    """Thread-safe LRU + TTL cache with hit/miss counters.
+
+    ``max_bytes`` bounds the total ``approx_size`` of the cached values; a
+    value larger than the whole budget is returned but not stored.
+    """
+
+    def __init__(self, max_entries=32, ttl=900, max_bytes=None, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _drop(self, key):
+        self.nbytes -= self._entries.pop(key)[2]
+        self.evictions += 1
+
+    def _expire(self, now):
+        for key in [k for k, (stored, _, _) in self._entries.items() if now - stored >= self.ttl]:
+            self._drop(key)
+
+    def _over_budget(self):
+        return len(self._entries) > self.max_entries or (
+            self.max_bytes is not None and self.nbytes > self.max_bytes)
+
+    def get(self, key, default=None):
+        with self._lock:
+            now = self.clock()
+            item = self._entries.get(key)
+            if item is None or now - item[0] >= self.ttl:
+                if item is not None:
+                    self._drop(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key, value):
+        size = approx_size(value) if self.max_bytes is not None else 0
+        with self._lock:
+            now = self.clock()
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[2]
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._entries[key] = (now, value, size)
+            self.nbytes += size
+            self._expire(now)
+            while self._over_budget():
+                self._drop(next(iter(self._entries)))
+
+    def get_or_build(self, key, build):
+        """Cached value for ``key``; on a miss, ``build()`` it and store the result."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = build()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self.nbytes,
+            "evictions": self.evictions,
+        }